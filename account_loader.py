@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+from solders.pubkey import Pubkey # type: ignore
+
+MAX_ACCOUNTS_PER_CALL = 100
+
+class AccountLoader:
+  """
+  Coalesces single-account reads into getMultipleAccounts calls. Requests
+  made within `window` seconds of each other share one call (chunked at 100
+  keys), and concurrent requests for the same key share one fetch. Exposes
+  get_account_info / get_multiple_accounts so it can stand in for the
+  AsyncClient wherever raw account bytes are read.
+  """
+
+  def __init__(self, client, window=0.002, max_keys=MAX_ACCOUNTS_PER_CALL):
+    self.client = client
+    self.window = window
+    self.max_keys = max_keys
+    self.pending = {}
+    self.inflight = {}
+    self.flush_handle = None
+
+    self.requests = 0
+    self.deduplicated = 0
+    self.rpc_calls = 0
+    self.accounts_fetched = 0
+
+  async def load(self, pubkey):
+    # solders Account or None, raw data in .data
+    key = str(pubkey)
+    self.requests += 1
+    future = self.pending.get(key) or self.inflight.get(key)
+    if future is not None:
+      self.deduplicated += 1
+    else:
+      loop = asyncio.get_running_loop()
+      future = self.pending[key] = loop.create_future()
+      if len(self.pending) >= self.max_keys:
+        self._flush()
+      elif self.flush_handle is None:
+        self.flush_handle = loop.call_later(self.window, self._flush)
+    # one caller giving up must not cancel the fetch for the others
+    return await asyncio.shield(future)
+
+  async def load_many(self, pubkeys) -> list:
+    return list(await asyncio.gather(*[self.load(pubkey) for pubkey in pubkeys]))
+
+  async def get_account_info(self, pubkey):
+    return SimpleNamespace(value=await self.load(pubkey))
+
+  async def get_multiple_accounts(self, pubkeys):
+    return SimpleNamespace(value=await self.load_many(pubkeys))
+
+  def _flush(self):
+    if self.flush_handle is not None:
+      self.flush_handle.cancel()
+      self.flush_handle = None
+    batch, self.pending = self.pending, {}
+    keys = list(batch)
+    for index in range(0, len(keys), self.max_keys):
+      chunk = {key: batch[key] for key in keys[index:index + self.max_keys]}
+      self.inflight.update(chunk)
+      asyncio.get_running_loop().create_task(self._fetch(chunk))
+
+  async def _fetch(self, chunk):
+    try:
+      self.rpc_calls += 1
+      resp = await self.client.get_multiple_accounts([Pubkey.from_string(key) for key in chunk])
+      self.accounts_fetched += len(chunk)
+      for future, account in zip(chunk.values(), resp.value):
+        if not future.done():
+          future.set_result(account)
+    except Exception as e:
+      for future in chunk.values():
+        if not future.done():
+          future.set_exception(e)
+    finally:
+      for key, future in chunk.items():
+        if self.inflight.get(key) is future:
+          del self.inflight[key]
+
+  def stats(self) -> dict:
+    return {
+      'requests': self.requests,
+      'deduplicated': self.deduplicated,
+      'rpc_calls': self.rpc_calls,
+      'accounts_fetched': self.accounts_fetched,
+      'saved_calls': self.requests - self.rpc_calls,
+    }
@@ -0,0 +1,92 @@
+import struct
+from layouts import AMM_INFO_LAYOUT_V4, AMM_INFO_V4_ACCOUNT_SIZE
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+# name -> (offset, size) for every field of AMM_INFO_LAYOUT_V4
+AMM_V4_FIELDS = {}
+_offset = 0
+for _subcon in AMM_INFO_LAYOUT_V4.subcons:
+  AMM_V4_FIELDS[_subcon.name] = (_offset, _subcon.sizeof())
+  _offset += _subcon.sizeof()
+
+HOT_FIELDS = (
+  'status',
+  'base_decimal',
+  'quote_decimal',
+  'trade_fee_numerator',
+  'trade_fee_denominator',
+  'swap_fee_numerator',
+  'swap_fee_denominator',
+  'base_need_take_pnl',
+  'quote_need_take_pnl',
+  'base_vault',
+  'quote_vault',
+)
+
+class AmmFieldDecoder:
+  """
+  Reads a subset of AMM_INFO_LAYOUT_V4 fields with one precompiled
+  struct.unpack_from call, skipping everything in between.
+  u64 fields decode to int, u128 fields to int and pubkeys to 32 raw bytes,
+  the same values AMM_INFO_LAYOUT_V4.parse produces.
+  """
+
+  def __init__(self, fields=HOT_FIELDS):
+    self.names = sorted(fields, key=lambda name: AMM_V4_FIELDS[name][0])
+    fmt = '<'
+    position = 0
+    for name in self.names:
+      offset, size = AMM_V4_FIELDS[name]
+      if offset > position:
+        fmt += f'{offset - position}x'
+      fmt += 'Q' if size == 8 else f'{size}s'
+      position = offset + size
+    self.struct = struct.Struct(fmt)
+    self.wide = [name for name in self.names if AMM_V4_FIELDS[name][1] == 16]
+
+  def decode(self, data) -> dict:
+    fields = dict(zip(self.names, self.struct.unpack_from(data)))
+    for name in self.wide:
+      fields[name] = int.from_bytes(fields[name], 'little')
+    return fields
+
+hot_field_decoder = AmmFieldDecoder(HOT_FIELDS)
+
+def decode_amm_fields(data, fields=None) -> dict:
+  if fields is None:
+    return hot_field_decoder.decode(data)
+  return AmmFieldDecoder(fields).decode(data)
+
+def verify_decoder(data, fields=None) -> list:
+  # names of fields where the fast decoder disagrees with the construct layout
+  fields = tuple(AMM_V4_FIELDS) if fields is None else fields
+  expected = AMM_INFO_LAYOUT_V4.parse(data)
+  decoded = AmmFieldDecoder(fields).decode(data)
+  return [name for name in fields if decoded[name] != expected[name]]
+
+def amm_dtype(fields=HOT_FIELDS, itemsize=AMM_INFO_V4_ACCOUNT_SIZE):
+  # u128 fields come out as (lo, hi) u64 pairs, pubkeys as 32 byte voids
+  formats = []
+  for name in fields:
+    size = AMM_V4_FIELDS[name][1]
+    formats.append('<u8' if size == 8 else ('<u8', (2,)) if size == 16 else 'V32')
+  return np.dtype({
+    'names': list(fields),
+    'formats': formats,
+    'offsets': [AMM_V4_FIELDS[name][0] for name in fields],
+    'itemsize': itemsize,
+  })
+
+def decode_amm_batch(datas, fields=HOT_FIELDS, itemsize=AMM_INFO_V4_ACCOUNT_SIZE):
+  # decode many accounts (e.g. one getMultipleAccounts response) into a numpy structured array
+  if np is None:
+    raise ImportError('numpy is required for decode_amm_batch')
+  datas = list(datas)
+  for data in datas:
+    if len(data) != itemsize:
+      raise ValueError(f'expected {itemsize} byte AMM accounts, got {len(data)}')
+  return np.frombuffer(b''.join(datas), dtype=amm_dtype(fields, itemsize))
@@ -0,0 +1,95 @@
+from solana.rpc.commitment import Confirmed
+from solana.rpc.types import MemcmpOpts
+from solders.pubkey import Pubkey # type: ignore
+
+from layouts import AMM_INFO_LAYOUT_V4, AMM_INFO_V4_ACCOUNT_SIZE, MARKET_STATE_LAYOUT_V3, layout_offset
+from pool_store import WSOL_MINT
+
+AMM_BASE_MINT_OFFSET = layout_offset(AMM_INFO_LAYOUT_V4, 'base_mint')
+AMM_QUOTE_MINT_OFFSET = layout_offset(AMM_INFO_LAYOUT_V4, 'quote_mint')
+
+class AmmResolver:
+  """
+  Resolves raydium v4 pool keys straight from chain.
+  The AMM account is found with getProgramAccounts memcmp filters on the
+  base/quote mint offsets, then decoded together with its serum market
+  into the same dict fetch_pool_keys returns.
+  """
+
+  def __init__(self, client, amm_program_id: Pubkey, commitment=Confirmed):
+    self.client = client
+    self.amm_program_id = amm_program_id
+    self.commitment = commitment
+    self.authority = Pubkey.find_program_address([b'amm authority'], amm_program_id)[0]
+    self.cache = {}
+
+  def resolve(self, key: str):
+    # key is a token mint paired with SOL, or an amm id
+    if key in self.cache:
+      return self.cache[key]
+
+    pubkey = Pubkey.from_string(key)
+    account = self.client.get_account_info(pubkey, commitment=self.commitment).value
+    if account is not None and account.owner == self.amm_program_id and len(account.data) == AMM_INFO_V4_ACCOUNT_SIZE:
+      amm_id, amm_data = pubkey, account.data
+    else:
+      found = self.find_amm(pubkey)
+      if found is None:
+        return None
+      amm_id, amm_data = found
+
+    pool_keys = self.decode_pool_keys(amm_id, amm_data)
+    self.cache[key] = pool_keys
+    return pool_keys
+
+  def find_amm(self, mint: Pubkey):
+    for mint_offset, sol_offset in (
+      (AMM_BASE_MINT_OFFSET, AMM_QUOTE_MINT_OFFSET),
+      (AMM_QUOTE_MINT_OFFSET, AMM_BASE_MINT_OFFSET),
+    ):
+      resp = self.client.get_program_accounts(
+        self.amm_program_id,
+        commitment=self.commitment,
+        encoding='base64',
+        filters=[
+          AMM_INFO_V4_ACCOUNT_SIZE,
+          MemcmpOpts(offset=mint_offset, bytes=str(mint)),
+          MemcmpOpts(offset=sol_offset, bytes=WSOL_MINT),
+        ],
+      )
+      if resp.value:
+        return resp.value[0].pubkey, resp.value[0].account.data
+    return None
+
+  def decode_pool_keys(self, amm_id: Pubkey, amm_data: bytes) -> dict:
+    amm = AMM_INFO_LAYOUT_V4.parse(amm_data)
+    market_id = Pubkey.from_bytes(amm.market_id)
+    serum_program_id = Pubkey.from_bytes(amm.serum_program_id)
+    market_data = self.client.get_account_info(market_id, commitment=self.commitment).value.data
+    return decode_pool_keys(amm_id, amm, market_id, serum_program_id, market_data, self.authority)
+
+def decode_pool_keys(amm_id, amm, market_id, serum_program_id, market_data, authority) -> dict:
+  market = MARKET_STATE_LAYOUT_V3.parse(market_data)
+  market_authority = Pubkey.create_program_address(
+    [bytes(market_id), market.vault_signer_nonce.to_bytes(8, 'little')], serum_program_id
+  )
+  return {
+    'amm_id': amm_id,
+    'authority': authority,
+    'base_mint': Pubkey.from_bytes(amm.base_mint),
+    'base_decimals': amm.base_decimal,
+    'quote_mint': Pubkey.from_bytes(amm.quote_mint),
+    'quote_decimals': amm.quote_decimal,
+    'lp_mint': Pubkey.from_bytes(amm.lp_mint),
+    'open_orders': Pubkey.from_bytes(amm.open_orders),
+    'target_orders': Pubkey.from_bytes(amm.target_orders),
+    'base_vault': Pubkey.from_bytes(amm.base_vault),
+    'quote_vault': Pubkey.from_bytes(amm.quote_vault),
+    'market_id': market_id,
+    'market_base_vault': Pubkey.from_bytes(market.base_vault),
+    'market_quote_vault': Pubkey.from_bytes(market.quote_vault),
+    'market_authority': market_authority,
+    'bids': Pubkey.from_bytes(market.bids),
+    'asks': Pubkey.from_bytes(market.asks),
+    'event_queue': Pubkey.from_bytes(market.event_queue),
+  }
@@ -0,0 +1,77 @@
+import threading, time
+from solana.rpc.types import TxOpts
+from histogram import LatencyHistogram
+
+# trigger -> sendTransaction acknowledged, per exit mode
+trigger_to_submit = {
+  'armed': LatencyHistogram(),
+  'signed_on_trigger': LatencyHistogram(),
+}
+
+def latency_report() -> dict:
+  return {mode: histogram.summary() for mode, histogram in trigger_to_submit.items()}
+
+class ArmedTransaction:
+  """
+  Keeps a fully built transaction signed and serialised against the newest
+  prefetched blockhash, so firing it is one send_raw_transaction. The
+  BlockhashService calls back after every refresh and the transaction is
+  re-signed there, off the trigger path. `submit`, when given, replaces the
+  single send: an async callable (raw, signature, last valid block height)
+  returning the signature, e.g. a multi-endpoint broadcast.
+  """
+
+  def __init__(self, client, transaction, signers, blockhash_service, opts=None, submit=None):
+    self.client = client
+    self.submit = submit
+    self.transaction = transaction
+    self.signers = signers
+    self.blockhash_service = blockhash_service
+    # the bytes were built and checked ahead of time, a failure shows up in confirmation
+    self.opts = opts or TxOpts(skip_preflight=True)
+    self.lock = threading.Lock()
+
+    self.raw = None
+    self.signature = None
+    self.blockhash = None
+    self.last_valid_block_height = None
+    self.signed_at = 0.0
+    self.resigns = 0
+
+  async def arm(self):
+    blockhash, last_valid_block_height = await self.blockhash_service.latest_async()
+    self._sign(blockhash, last_valid_block_height)
+    self.blockhash_service.listeners.append(self._sign)
+    return self
+
+  def disarm(self):
+    if self._sign in self.blockhash_service.listeners:
+      self.blockhash_service.listeners.remove(self._sign)
+
+  def _sign(self, blockhash, last_valid_block_height):
+    with self.lock:
+      if blockhash == self.blockhash:
+        return
+      self.transaction.recent_blockhash = blockhash
+      self.transaction.sign(*self.signers)
+      self.raw = self.transaction.serialize()
+      self.signature = self.transaction.signature()
+      self.blockhash = blockhash
+      self.last_valid_block_height = last_valid_block_height
+      self.signed_at = time.monotonic()
+      self.resigns += 1
+
+  async def fire(self, triggered_at=None):
+    # (signature, last valid block height) once the RPC node accepted the bytes
+    triggered_at = triggered_at or time.perf_counter()
+    if time.monotonic() - self.signed_at >= self.blockhash_service.max_age:
+      # the refresh thread fell behind: sign against whatever is current now
+      self._sign(*await self.blockhash_service.latest_async())
+    with self.lock:
+      raw, signature, last_valid_block_height = self.raw, self.signature, self.last_valid_block_height
+    if self.submit is not None:
+      signature = await self.submit(raw, signature, last_valid_block_height)
+    else:
+      signature = (await self.client.send_raw_transaction(raw, opts=self.opts)).value
+    trigger_to_submit['armed'].record(time.perf_counter() - triggered_at)
+    return signature, last_valid_block_height
@@ -0,0 +1,191 @@
+import argparse, asyncio, contextlib, io, json, os, tempfile, time
+from collections import Counter
+from histogram import LatencyHistogram
+from rpc_standin import RpcStandIn
+
+# usage: python bench_swap.py [--latency 0.02] [--swaps 20] [--wallets 8] [--failure-rate 0.02] [--json baseline.json]
+# runs every swap path against a local RPC stand-in and reports end-to-end latency, per-stage latency
+# from the trade journal, RPC calls per operation and throughput
+
+SCENARIOS = (
+  'buy', 'sell', 'buy_concurrent', 'sell_concurrent', 'executor', 'executor_batched',
+  'liquidity_remove', 'create_spl_token',
+)
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Benchmark the swap paths against a local RPC stand-in')
+  parser.add_argument('--latency', type=float, default=0.02, help='seconds of injected latency per RPC call')
+  parser.add_argument('--swaps', type=int, default=20, help='operations per scenario')
+  parser.add_argument('--wallets', type=int, default=8, help='wallets for the executor scenarios')
+  parser.add_argument('--failure-rate', type=float, default=0.0, help='share of RPC calls answered with an error')
+  parser.add_argument('--drop-rate', type=float, default=0.0, help='share of sent transactions that never land')
+  parser.add_argument('--blocks-per-second', type=float, default=2.5, help='block height progress, lets dropped transactions expire')
+  parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated subset of ' + ', '.join(SCENARIOS))
+  parser.add_argument('--seed', type=int, default=1, help='seed for the injected failures')
+  parser.add_argument('--trace', action='store_true', help='record tracing spans and report them per stage')
+  parser.add_argument('--json', dest='json_path', help='also write the results to this file')
+  return parser.parse_args()
+
+async def timed(coro):
+  # (seconds, ok)
+  start_time = time.perf_counter()
+  try:
+    result = await coro
+    ok = result is not False and result != 'failed'
+  except Exception:
+    ok = False
+  return time.perf_counter() - start_time, ok
+
+async def run_sequential(operation, count):
+  return [await timed(operation()) for _ in range(count)]
+
+async def run_concurrent(operation, count):
+  return list(await asyncio.gather(*[timed(operation()) for _ in range(count)]))
+
+def stage_report(rows) -> dict:
+  # per-stage latency summaries over journal rows that carry stage timings
+  stages = {}
+  for row in rows:
+    for stage, ms in json.loads(row['stages'] or '{}').items():
+      stages.setdefault(stage, LatencyHistogram()).record(ms / 1000)
+  return {stage: histogram.summary() for stage, histogram in stages.items()}
+
+def print_results(args, results):
+  print(f"rpc latency {args.latency * 1000:.0f} ms, failure rate {args.failure_rate:.1%}, "
+        f"drop rate {args.drop_rate:.1%}, {args.swaps} operations per scenario")
+  print(f"{'scenario':<18}{'ops':>5}{'ok':>5}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>9}{'rpc/op':>8}")
+  for name, result in results['scenarios'].items():
+    latency = result['latency']
+    print(f"{name:<18}{result['ops']:>5}{result['ok']:>5}{latency['mean_ms']:>10.1f}{latency['p50_ms']:>10.1f}"
+          f"{latency['p99_ms']:>10.1f}{latency['max_ms']:>10.1f}{result['ops_per_second']:>9.1f}{result['rpc_per_op']:>8.1f}")
+  for name, result in results['scenarios'].items():
+    if result['stages']:
+      print(f'{name} stages: ' + '  '.join(f"{stage} p50 {summary['p50_ms']:.1f} p99 {summary['p99_ms']:.1f}" for stage, summary in result['stages'].items()))
+  for name, result in results['scenarios'].items():
+    print(f"{name} rpc: {result['rpc_calls']}")
+  for name, summary in results.get('spans', {}).items():
+    print(f"span {name:<34} n {summary['count']:>5}  p50 {summary['p50_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms  max {summary['max_ms']:8.2f} ms")
+  for name, stats in results['components'].items():
+    print(f'{name}: {stats}')
+
+def main():
+  args = parse_args()
+  json_path = os.path.abspath(args.json_path) if args.json_path else None
+  scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+  unknown = set(scenarios) - set(SCENARIOS)
+  if unknown:
+    raise SystemExit(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+  standin = RpcStandIn(
+    latency=args.latency, failure_rate=args.failure_rate, drop_rate=args.drop_rate,
+    blocks_per_second=args.blocks_per_second, seed=args.seed,
+  ).start().start_websocket()
+  os.environ['RPC_HTTPS_URL'] = standin.url
+  os.environ['RPC_WSS_URL'] = standin.ws_url
+  os.environ.setdefault('MAX_RETRIES', '3')
+  os.environ.setdefault('RETRY_DELAY', '1')
+  # keep the bench pool index, compute unit cache and journal out of the working directory
+  os.chdir(tempfile.mkdtemp(prefix='bench_swap_'))
+
+  from solders.keypair import Keypair # type: ignore
+  import solana_api, tracing, utils
+  from swap_executor import SwapExecutor, SwapOrder
+  if args.trace:
+    tracing.enable()
+
+  payer = Keypair()
+  mint = Keypair().pubkey()
+  pool_keys = standin.add_pool(mint, payer.pubkey())
+  utils.get_pool_store().put(pool_keys)
+  wallets = [Keypair() for _ in range(args.wallets)]
+  for wallet in wallets:
+    standin.add_token_account(Keypair().pubkey(), mint, wallet.pubkey(), 10 ** 12, pool_keys['base_decimals'])
+  # liquidity_remove burns the payer's LP tokens; the stand-in never debits them
+  standin.add_mint(pool_keys['lp_mint'], 9)
+  standin.add_token_account(Keypair().pubkey(), pool_keys['lp_mint'], payer.pubkey(), 10 ** 12, 9)
+  # the synthetic index counts as fresh, no raydium download during the run
+  utils.get_pool_store().set_meta('refreshed_at', time.time())
+
+  def buy():
+    return solana_api.buy(str(mint), payer, 0.01)
+
+  def sell():
+    return solana_api.sell(str(mint), payer, 1)
+
+  def liquidity_remove():
+    return solana_api.liquidity_remove(solana_api.get_async_client(), str(pool_keys['amm_id']), payer)
+
+  async def create_spl_token():
+    return await asyncio.to_thread(solana_api.create_spl_token, 'Bench', 'BNCH', 'https://example.invalid/bench.json', payer)
+
+  def orders():
+    return [SwapOrder(mint, 'buy' if index % 2 else 'sell', 0.01 if index % 2 else 1) for index in range(args.swaps * 2)]
+
+  async def executor():
+    executed = await SwapExecutor(wallets).run(orders())
+    return [(result['run_ms'] / 1000, result['ok']) for result in executed]
+
+  async def executor_batched():
+    executed, _ = await SwapExecutor(wallets).run_batched(orders())
+    return [(result['run_ms'] / 1000, result['ok']) for result in executed]
+
+  runs = {
+    'buy': lambda: run_sequential(buy, args.swaps),
+    'sell': lambda: run_sequential(sell, args.swaps),
+    'buy_concurrent': lambda: run_concurrent(buy, args.swaps),
+    'sell_concurrent': lambda: run_concurrent(sell, args.swaps),
+    'executor': executor,
+    'executor_batched': executor_batched,
+    'liquidity_remove': lambda: run_sequential(liquidity_remove, args.swaps),
+    'create_spl_token': lambda: run_sequential(create_spl_token, args.swaps),
+  }
+
+  async def run():
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+      # warm caches and connections
+      await buy()
+      await sell()
+      tracing.reset()
+      for name in scenarios:
+        solana_api.journal.flush()
+        journal_mark = max((row['id'] for row in solana_api.journal.rows()), default=0)
+        calls_before = Counter(standin.calls)
+        start_time = time.perf_counter()
+        timings = await runs[name]()
+        wall = time.perf_counter() - start_time
+        solana_api.journal.flush()
+        calls = Counter(standin.calls)
+        calls.subtract(calls_before)
+        histogram = LatencyHistogram()
+        for seconds, _ in timings:
+          histogram.record(seconds)
+        results[name] = {
+          'ops': len(timings),
+          'ok': sum(ok for _, ok in timings),
+          'wall_ms': wall * 1000,
+          'ops_per_second': len(timings) / wall if wall else 0.0,
+          'latency': histogram.summary(),
+          'stages': stage_report(solana_api.journal.rows(after_id=journal_mark)),
+          'rpc_per_op': sum(calls.values()) / max(len(timings), 1),
+          'rpc_calls': {method: count for method, count in sorted(calls.items()) if count},
+        }
+    components = {
+      'account loader': solana_api.get_account_loader().stats(),
+      'confirmer': solana_api.get_confirmer().stats(),
+      'compute units': solana_api.compute_units.stats(),
+      'journal': solana_api.journal.stats(),
+      'standin failures': dict(standin.failures),
+    }
+    return {'scenarios': results, 'components': components, 'spans': tracing.snapshot()}
+
+  results = asyncio.run(run())
+  results['settings'] = {key: value for key, value in vars(args).items() if key != 'json_path'}
+  print_results(args, results)
+  if json_path:
+    with open(json_path, 'w') as file:
+      json.dump(results, file, indent=2)
+  standin.stop()
+
+if __name__ == '__main__':
+  main()
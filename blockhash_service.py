@@ -0,0 +1,96 @@
+import asyncio, threading, time
+from solana.rpc.commitment import Confirmed
+
+class BlockhashService:
+  """
+  Keeps a recent blockhash ready so sends skip the getLatestBlockhash round-trip.
+  A daemon thread refreshes it every `interval` seconds; a hash older than
+  `max_age` seconds is refetched synchronously instead of being served.
+  Every hash served from the prefetch counts the average fetch latency as time saved.
+  `listeners` are called with (blockhash, last valid block height) after each refresh.
+  """
+
+  def __init__(self, client, interval=2.0, max_age=20.0, commitment=Confirmed):
+    self.client = client
+    self.interval = interval
+    self.max_age = max_age
+    self.commitment = commitment
+    self.lock = threading.Lock()
+    self.stopped = threading.Event()
+    self.thread = None
+    self.listeners = []
+
+    self.blockhash = None
+    self.last_valid_block_height = None
+    self.fetched_at = 0.0
+    self.fetch_time = 0.0
+    self.fetches = 0
+    self.served = 0
+    self.saved_time = 0.0
+
+  def refresh(self):
+    start_time = time.perf_counter()
+    resp = self.client.get_latest_blockhash(commitment=self.commitment)
+    elapsed = time.perf_counter() - start_time
+    with self.lock:
+      self.blockhash = resp.value.blockhash
+      self.last_valid_block_height = resp.value.last_valid_block_height
+      self.fetched_at = time.monotonic()
+      # moving average of what a send would otherwise spend fetching the hash
+      self.fetch_time = elapsed if self.fetches == 0 else self.fetch_time * 0.8 + elapsed * 0.2
+      self.fetches += 1
+    for listener in list(self.listeners):
+      try:
+        listener(resp.value.blockhash, resp.value.last_valid_block_height)
+      except Exception as e:
+        print('blockhash listener failed: ', e)
+
+  def start(self):
+    if self.thread is not None and self.thread.is_alive():
+      return
+    self.stopped.clear()
+    self.thread = threading.Thread(target=self._run, name='blockhash-service', daemon=True)
+    self.thread.start()
+
+  def stop(self):
+    self.stopped.set()
+
+  def _run(self):
+    while not self.stopped.wait(self.interval):
+      try:
+        self.refresh()
+      except Exception as e:
+        print('blockhash refresh failed: ', e)
+
+  def latest(self):
+    # (blockhash, last valid block height) ready for transaction assembly
+    self.start()
+    with self.lock:
+      fresh = self.blockhash is not None and time.monotonic() - self.fetched_at < self.max_age
+      if fresh:
+        self.served += 1
+        self.saved_time += self.fetch_time
+        return self.blockhash, self.last_valid_block_height
+    self.refresh()
+    with self.lock:
+      return self.blockhash, self.last_valid_block_height
+
+  async def latest_async(self):
+    # same as latest(), a refetch runs off the event loop
+    self.start()
+    with self.lock:
+      if self.blockhash is not None and time.monotonic() - self.fetched_at < self.max_age:
+        self.served += 1
+        self.saved_time += self.fetch_time
+        return self.blockhash, self.last_valid_block_height
+    return await asyncio.to_thread(self.latest)
+
+  def stats(self) -> dict:
+    with self.lock:
+      return {
+        'fetches': self.fetches,
+        'served': self.served,
+        'fetch_ms': self.fetch_time * 1000,
+        'saved_ms_total': self.saved_time * 1000,
+        'saved_ms_per_send': self.saved_time / self.served * 1000 if self.served else 0.0,
+      }
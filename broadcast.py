@@ -0,0 +1,128 @@
+import asyncio, time
+from solana.rpc.types import TxOpts
+
+class EndpointStats:
+  # acceptance is a moving average, so old failures fade; an endpoint whose last failure is
+  # `retry_after` seconds old ranks as if it had recovered and gets probed again
+  def __init__(self, url, retry_after=30.0):
+    self.url = url
+    self.retry_after = retry_after
+    self.sends = 0
+    self.accepted = 0
+    self.failures = 0
+    self.first = 0
+    self.latency = None
+    self.acceptance = None
+    self.failed_at = None
+
+  def record(self, elapsed, ok):
+    self.sends += 1
+    self.acceptance = float(ok) if self.acceptance is None else self.acceptance * 0.8 + float(ok) * 0.2
+    if ok:
+      self.accepted += 1
+      self.latency = elapsed if self.latency is None else self.latency * 0.8 + elapsed * 0.2
+    else:
+      self.failures += 1
+      self.failed_at = time.monotonic()
+
+  def score(self) -> float:
+    # lower is better; endpoints without a successful send yet rank first so they get measured
+    recovered = self.failed_at is None or time.monotonic() - self.failed_at >= self.retry_after
+    if self.latency is None:
+      return 0.0 if recovered else float('inf')
+    return self.latency / (1.0 if recovered else max(self.acceptance, 0.05))
+
+  def summary(self) -> dict:
+    return {
+      'sends': self.sends,
+      'accepted': self.accepted,
+      'failures': self.failures,
+      'first': self.first,
+      'latency_ms': None if self.latency is None else self.latency * 1000,
+      'score': self.score(),
+    }
+
+class Broadcaster:
+  """
+  Sends signed transaction bytes to several RPC endpoints at once and returns
+  as soon as the first one accepts them. Until the transaction's
+  confirmation future resolves (confirmed, failed or expired) the same bytes
+  are rebroadcast every `rebroadcast_interval` seconds. Per-endpoint latency
+  and acceptance rate rank the endpoints; with `fanout` set only the best
+  ranked ones are used, and one that failed is tried again after
+  `retry_after` seconds.
+  """
+
+  def __init__(self, clients: dict, rebroadcast_interval=2.0, fanout=None, retry_after=30.0):
+    self.clients = clients
+    self.rebroadcast_interval = rebroadcast_interval
+    self.fanout = fanout
+    # nodes forward to the leader themselves, a duplicate send is harmless
+    self.opts = TxOpts(skip_preflight=True, max_retries=0)
+    self.endpoints = {url: EndpointStats(url, retry_after) for url in clients}
+    self.rebroadcasting = set()
+
+    self.submitted = 0
+    self.rebroadcasts = 0
+
+  def ranking(self) -> list:
+    return sorted(self.endpoints, key=lambda url: self.endpoints[url].score())
+
+  async def _send_one(self, url, raw):
+    start_time = time.perf_counter()
+    try:
+      resp = await self.clients[url].send_raw_transaction(raw, opts=self.opts)
+    except Exception:
+      self.endpoints[url].record(time.perf_counter() - start_time, False)
+      raise
+    self.endpoints[url].record(time.perf_counter() - start_time, True)
+    return url, resp.value
+
+  async def send(self, raw: bytes):
+    # signature from the first endpoint that accepts, the other sends finish in the background
+    urls = self.ranking()[:self.fanout] if self.fanout else self.ranking()
+    pending = {asyncio.get_running_loop().create_task(self._send_one(url, raw)) for url in urls}
+    errors = []
+    while pending:
+      done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+      for task in done:
+        if task.exception() is None:
+          url, signature = task.result()
+          self.endpoints[url].first += 1
+          for other in pending:
+            other.add_done_callback(_consume)
+          return signature
+        errors.append(task.exception())
+    raise errors[0]
+
+  async def submit(self, raw: bytes, confirmation: asyncio.Future):
+    signature = await self.send(raw)
+    self.submitted += 1
+    task = asyncio.get_running_loop().create_task(self._rebroadcast(raw, confirmation))
+    self.rebroadcasting.add(task)
+    task.add_done_callback(self.rebroadcasting.discard)
+    return signature
+
+  async def _rebroadcast(self, raw, confirmation):
+    while True:
+      await asyncio.wait([confirmation], timeout=self.rebroadcast_interval)
+      if confirmation.done():
+        return
+      self.rebroadcasts += 1
+      try:
+        await self.send(raw)
+      except Exception as e:
+        print('rebroadcast failed on every endpoint: ', e)
+
+  def stats(self) -> dict:
+    return {
+      'submitted': self.submitted,
+      'rebroadcasts': self.rebroadcasts,
+      'ranking': self.ranking(),
+      'endpoints': {url: stats.summary() for url, stats in self.endpoints.items()},
+    }
+
+def _consume(task):
+  # losing sends may fail; their outcome is already in the endpoint stats
+  if not task.cancelled():
+    task.exception()
@@ -0,0 +1,83 @@
+import asyncio, threading
+from histogram import LatencyHistogram
+
+class BackgroundLoop:
+  """
+  One event loop for the life of the CLI, run on a daemon thread. Commands
+  are handed over as coroutines, so the per-loop RPC clients, websocket and
+  caches in solana_api outlive a single command instead of being rebuilt by
+  asyncio.run() every time.
+  """
+
+  def __init__(self):
+    self.loop = asyncio.new_event_loop()
+    self.thread = threading.Thread(target=self._run, name='cli-loop', daemon=True)
+    self.thread.start()
+
+  def _run(self):
+    asyncio.set_event_loop(self.loop)
+    self.loop.run_forever()
+
+  def submit(self, coro):
+    # concurrent.futures.Future of the coroutine's result
+    return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+  def run(self, coro):
+    # blocks the calling thread until the coroutine is done
+    return self.submit(coro).result()
+
+  async def _cancel_tasks(self):
+    # websocket readers and pollers are left running by the commands; cancel them before the loop stops
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+  def close(self, timeout=5.0):
+    if not self.loop.is_running():
+      return
+    try:
+      self.submit(self._cancel_tasks()).result(timeout)
+    except Exception as e:
+      print('fail to cancel background tasks: ', e)
+    self.loop.call_soon_threadsafe(self.loop.stop)
+    self.thread.join(timeout)
+
+class CommandLatency:
+  # wall time per command, the first invocation kept apart from the rest
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.first = {}
+    self.subsequent = {}
+
+  def record(self, command, seconds):
+    with self.lock:
+      if command not in self.first:
+        self.first[command] = seconds
+        return
+      histogram = self.subsequent.get(command)
+      if histogram is None:
+        histogram = self.subsequent[command] = LatencyHistogram()
+      histogram.record(seconds)
+
+  def report(self) -> dict:
+    with self.lock:
+      return {
+        command: {
+          'first_ms': first * 1000,
+          'subsequent': self.subsequent[command].summary() if command in self.subsequent else None,
+        }
+        for command, first in self.first.items()
+      }
+
+def format_latency(report) -> str:
+  lines = [f"{'command':<20}{'first ms':>10}{'n':>6}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}"]
+  for command, entry in report.items():
+    line = f"{command:<20}{entry['first_ms']:>10.1f}"
+    subsequent = entry['subsequent']
+    if subsequent is None:
+      line += f"{0:>6}{'-':>10}{'-':>10}{'-':>10}"
+    else:
+      line += f"{subsequent['count']:>6}{subsequent['mean_ms']:>10.1f}{subsequent['p50_ms']:>10.1f}{subsequent['p99_ms']:>10.1f}"
+    lines.append(line)
+  return '\n'.join(lines)
@@ -0,0 +1,110 @@
+import asyncio, sqlite3, threading, time
+
+COMPUTE_UNITS_DB_FILE = 'compute_units.db'
+MAX_COMPUTE_UNIT_LIMIT = 1400000
+
+def transaction_shape(amm_id, direction, creates_account) -> str:
+  # transactions of one shape run the same instructions and consume about the same compute
+  return f'{amm_id}:{direction}:{int(bool(creates_account))}'
+
+class ComputeUnitCache:
+  """
+  Compute unit limits per transaction shape, sized from simulateTransaction.
+  The first transaction of a shape is simulated once; the units it consumed
+  are kept on disk and every later transaction of that shape gets them plus
+  `margin` (at least `min_headroom` units) as its limit. Concurrent misses on
+  one shape share a single simulation. Until a simulation succeeds the
+  caller's default limit is used; after a failed one the shape is not
+  simulated again for `failure_ttl` seconds.
+  """
+
+  def __init__(self, path=COMPUTE_UNITS_DB_FILE, margin=0.1, min_headroom=5000, failure_ttl=30.0):
+    self.path = path
+    self.margin = margin
+    self.min_headroom = min_headroom
+    self.failure_ttl = failure_ttl
+    self.lock = threading.Lock()
+    self.conn = sqlite3.connect(path, check_same_thread=False)
+    self.conn.execute('PRAGMA journal_mode=WAL')
+    self.conn.execute(
+      'CREATE TABLE IF NOT EXISTS shapes (shape TEXT PRIMARY KEY, units INTEGER NOT NULL, '
+      'samples INTEGER NOT NULL, updated_at REAL NOT NULL)'
+    )
+    self.conn.commit()
+    self.units = dict(self.conn.execute('SELECT shape, units FROM shapes').fetchall())
+    self.simulating = {}
+    # shape -> monotonic time a failed shape may be simulated again
+    self.failed = {}
+
+    self.hits = 0
+    self.skipped = 0
+    self.simulations = 0
+    self.failures = 0
+
+  def _limit(self, units) -> int:
+    return min(max(int(units * (1 + self.margin)), units + self.min_headroom), MAX_COMPUTE_UNIT_LIMIT)
+
+  def limit(self, shape):
+    units = self.units.get(shape)
+    return None if units is None else self._limit(units)
+
+  def record(self, shape, units):
+    # keeps the largest consumption seen so the limit never undercuts a known run
+    units = max(int(units), self.units.get(shape, 0))
+    self.units[shape] = units
+    with self.lock:
+      self.conn.execute(
+        'INSERT INTO shapes (shape, units, samples, updated_at) VALUES (?, ?, 1, ?) '
+        'ON CONFLICT (shape) DO UPDATE SET units = excluded.units, samples = samples + 1, updated_at = excluded.updated_at',
+        (shape, units, time.time()),
+      )
+      self.conn.commit()
+
+  async def limit_async(self, shape, simulate, default: int) -> int:
+    # `simulate` is an async callable returning the units consumed, or None when the simulation failed
+    limit = self.limit(shape)
+    if limit is not None:
+      self.hits += 1
+      return limit
+    retry_at = self.failed.get(shape)
+    if retry_at is not None:
+      if time.monotonic() < retry_at:
+        self.skipped += 1
+        return default
+      del self.failed[shape]
+    task = self.simulating.get(shape)
+    if task is None:
+      task = self.simulating[shape] = asyncio.get_running_loop().create_task(self._simulate(shape, simulate))
+    await asyncio.shield(task)
+    limit = self.limit(shape)
+    return default if limit is None else limit
+
+  async def _simulate(self, shape, simulate):
+    self.simulations += 1
+    try:
+      units = await simulate()
+    except Exception as e:
+      print('compute unit simulation failed: ', e)
+      units = None
+    finally:
+      del self.simulating[shape]
+    if units:
+      self.record(shape, units)
+    else:
+      self.failures += 1
+      self.failed[shape] = time.monotonic() + self.failure_ttl
+
+  def stats(self) -> dict:
+    return {
+      'shapes': len(self.units), 'hits': self.hits, 'simulations': self.simulations,
+      'failures': self.failures, 'skipped': self.skipped,
+    }
+
+async def simulate_units(client, tx, *signers):
+  # units consumed by `tx`, which must carry a blockhash and the maximum limit
+  tx.sign(*signers)
+  resp = await client.simulate_transaction(tx)
+  if resp.value.err is not None:
+    print('simulation error: ', resp.value.err)
+    return None
+  return resp.value.units_consumed
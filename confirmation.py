@@ -0,0 +1,122 @@
+import asyncio
+from solana.rpc.commitment import Confirmed
+from solana.rpc.core import TransactionExpiredBlockheightExceededError
+
+MAX_SIGNATURES_PER_CALL = 256
+COMMITMENT_RANK = {'processed': 0, 'confirmed': 1, 'finalized': 2}
+
+class TransactionFailedError(Exception):
+  pass
+
+class SignatureConfirmer:
+  """
+  Confirms every outstanding signature with shared getSignatureStatuses polls.
+  Callers await the future returned by confirm(); one poll covers up to 256
+  signatures. The poll interval starts at `min_interval` and backs off
+  towards `max_interval` while nothing changes. A signature whose last valid
+  block height has passed fails with TransactionExpiredBlockheightExceededError.
+  """
+
+  def __init__(self, client, min_interval=0.2, max_interval=2.0, backoff=1.5):
+    self.client = client
+    self.min_interval = min_interval
+    self.max_interval = max_interval
+    self.backoff = backoff
+    self.interval = min_interval
+    self.pending = {}
+    self.wakeup = asyncio.Event()
+    self.task = None
+
+    self.polls = 0
+    self.rpc_calls = 0
+    self.confirmed = 0
+    self.failed = 0
+    self.expired = 0
+
+  def confirm(self, signature, last_valid_block_height=None, commitment='confirmed') -> asyncio.Future:
+    entry = self.pending.get(signature)
+    if entry is None or entry[0].done():
+      entry = [asyncio.get_running_loop().create_future(), COMMITMENT_RANK[str(commitment)], last_valid_block_height]
+      self.pending[signature] = entry
+    if self.task is None or self.task.done():
+      self.task = asyncio.get_running_loop().create_task(self._run())
+    self.wakeup.set()
+    return entry[0]
+
+  def discard(self, signature):
+    # stops polling a signature that never went out; its future is cancelled
+    entry = self.pending.pop(signature, None)
+    if entry is not None and not entry[0].done():
+      entry[0].cancel()
+
+  async def _run(self):
+    while self.pending:
+      self.wakeup.clear()
+      try:
+        await asyncio.wait_for(self.wakeup.wait(), self.interval)
+        # a new signature arrived: give it a short head start before polling
+        self.interval = self.min_interval
+        await asyncio.sleep(self.min_interval)
+      except asyncio.TimeoutError:
+        pass
+
+      try:
+        progressed = await self._poll()
+      except Exception as e:
+        print('signature status poll failed: ', e)
+        progressed = False
+      self.interval = self.min_interval if progressed else min(self.interval * self.backoff, self.max_interval)
+
+  async def _poll(self) -> bool:
+    for signature in [signature for signature, entry in self.pending.items() if entry[0].done()]:
+      del self.pending[signature]
+    if not self.pending:
+      return False
+
+    signatures = list(self.pending)
+    calls = [
+      self.client.get_signature_statuses(signatures[index:index + MAX_SIGNATURES_PER_CALL])
+      for index in range(0, len(signatures), MAX_SIGNATURES_PER_CALL)
+    ]
+    check_expiry = any(entry[2] is not None for entry in self.pending.values())
+    if check_expiry:
+      calls.append(self.client.get_block_height(Confirmed))
+    results = await asyncio.gather(*calls)
+    self.polls += 1
+    self.rpc_calls += len(calls)
+
+    block_height = results.pop().value if check_expiry else None
+    statuses = [status for resp in results for status in resp.value]
+
+    progressed = False
+    for signature, status in zip(signatures, statuses):
+      entry = self.pending.get(signature)
+      if entry is None:
+        continue
+      future, rank, last_valid_block_height = entry
+      if future.done():
+        pass
+      elif status is not None and status.err is not None:
+        future.set_exception(TransactionFailedError(f'{signature} failed: {status.err}'))
+        self.failed += 1
+      elif status is not None and status.confirmation_status is not None and int(status.confirmation_status) >= rank:
+        future.set_result(status)
+        self.confirmed += 1
+      elif last_valid_block_height is not None and block_height > last_valid_block_height:
+        future.set_exception(TransactionExpiredBlockheightExceededError(f'{signature} has expired: block height exceeded'))
+        self.expired += 1
+      else:
+        continue
+      del self.pending[signature]
+      progressed = True
+    return progressed
+
+  def stats(self) -> dict:
+    return {
+      'pending': len(self.pending),
+      'polls': self.polls,
+      'rpc_calls': self.rpc_calls,
+      'confirmed': self.confirmed,
+      'failed': self.failed,
+      'expired': self.expired,
+    }
@@ -0,0 +1,68 @@
+class LatencyHistogram:
+  """
+  Log-linear latency histogram in microseconds. Each power of two is split
+  into `sub_buckets` equal buckets, so any recorded value is reported within
+  1/sub_buckets of its true size while memory stays a few hundred counters.
+  """
+
+  def __init__(self, sub_buckets=16):
+    self.sub_buckets = sub_buckets
+    self.sub_bits = sub_buckets.bit_length() - 1
+    self.counts = {}
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def _index(self, micros):
+    shift = max(micros.bit_length() - self.sub_bits - 1, 0)
+    return shift * self.sub_buckets + (micros >> shift)
+
+  def _bounds(self, index):
+    if index < 2 * self.sub_buckets:
+      return index, index + 1
+    shift = index // self.sub_buckets - 1
+    mantissa = index - shift * self.sub_buckets
+    return mantissa << shift, (mantissa + 1) << shift
+
+  def record(self, seconds):
+    index = self._index(max(int(seconds * 1000000), 0))
+    self.counts[index] = self.counts.get(index, 0) + 1
+    self.count += 1
+    self.total += seconds
+    self.max = max(self.max, seconds)
+
+  def merge(self, other):
+    for index, count in other.counts.items():
+      self.counts[index] = self.counts.get(index, 0) + count
+    self.count += other.count
+    self.total += other.total
+    self.max = max(self.max, other.max)
+
+  def reset(self):
+    self.counts.clear()
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def percentile(self, percent) -> float:
+    # seconds, midpoint of the bucket holding the percentile
+    if not self.count:
+      return 0.0
+    rank = max(percent / 100 * self.count, 1)
+    seen = 0
+    for index in sorted(self.counts):
+      seen += self.counts[index]
+      if seen >= rank:
+        low, high = self._bounds(index)
+        return min((low + high) / 2 / 1000000, self.max)
+    return self.max
+
+  def summary(self) -> dict:
+    return {
+      'count': self.count,
+      'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+      'p50_ms': self.percentile(50) * 1000,
+      'p90_ms': self.percentile(90) * 1000,
+      'p99_ms': self.percentile(99) * 1000,
+      'max_ms': self.max * 1000,
+    }
@@ -0,0 +1,168 @@
+import csv, json, queue, sqlite3, threading, time
+from datetime import datetime, timezone
+
+JOURNAL_DB_FILE = 'trades.db'
+COLUMNS = (
+  'ts', 'kind', 'status', 'mint', 'wallet', 'signature', 'amount', 'amount_out', 'slot',
+  'fee_lamports', 'compute_unit_price', 'compute_unit_limit', 'stages', 'error',
+)
+CSV_HEADER = ('date',) + COLUMNS[1:]
+
+_STOP = object()
+
+class TradeJournal:
+  """
+  Append-only trade log in SQLite, written by a background thread. record()
+  only queues the row, so the swap path never touches the disk. The writer
+  commits a batch once `sync_records` rows are buffered or the oldest one has
+  waited `sync_interval` seconds; with `durable` the database runs with
+  synchronous=FULL and every commit is fsynced.
+  """
+
+  def __init__(self, path=JOURNAL_DB_FILE, sync_records=64, sync_interval=0.05, durable=True):
+    self.path = path
+    self.sync_records = sync_records
+    self.sync_interval = sync_interval
+    self.queue = queue.SimpleQueue()
+    self.lock = threading.Lock()
+    self.conn = sqlite3.connect(path, check_same_thread=False)
+    self.conn.execute('PRAGMA journal_mode=WAL')
+    self.conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+    self.conn.execute(
+      'CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, '
+      'kind TEXT NOT NULL, status TEXT NOT NULL, mint TEXT, wallet TEXT, signature TEXT, amount INTEGER, '
+      'amount_out INTEGER, slot INTEGER, fee_lamports INTEGER, compute_unit_price INTEGER, compute_unit_limit INTEGER, '
+      'stages TEXT, error TEXT)'
+    )
+    self.conn.commit()
+    self.thread = None
+    # called from the writer thread with each committed batch, as row dicts including id
+    self.listeners = []
+
+    self.records = 0
+    self.written = 0
+    self.commits = 0
+
+  def record(self, kind, status, mint=None, wallet=None, signature=None, amount=None, amount_out=None, slot=None,
+             fee_lamports=None, compute_unit_price=None, compute_unit_limit=None, stages=None, error=None, ts=None):
+    # amounts are raw units of the input and output mint; stages: {stage: seconds}, stored as milliseconds
+    stages = json.dumps({stage: round(seconds * 1000, 3) for stage, seconds in stages.items()}) if stages else None
+    row = (
+      time.time() if ts is None else ts, kind, status, None if mint is None else str(mint),
+      None if wallet is None else str(wallet), None if signature is None else str(signature), amount, amount_out,
+      slot, fee_lamports, compute_unit_price, compute_unit_limit, stages, None if error is None else str(error),
+    )
+    self._start()
+    self.records += 1
+    self.queue.put(row)
+
+  def _start(self):
+    if self.thread is None:
+      with self.lock:
+        if self.thread is None:
+          self.thread = threading.Thread(target=self._run, name='trade-journal', daemon=True)
+          self.thread.start()
+
+  def _run(self):
+    batch = []
+    deadline = None
+    while True:
+      try:
+        item = self.queue.get(timeout=None if not batch else max(deadline - time.monotonic(), 0))
+      except queue.Empty:
+        item = None
+      if item is _STOP:
+        self._write(batch)
+        return
+      if isinstance(item, threading.Event):
+        # flush() marker: everything queued before it goes out now
+        self._write(batch)
+        batch = []
+        item.set()
+        continue
+      if item is not None:
+        if not batch:
+          deadline = time.monotonic() + self.sync_interval
+        batch.append(item)
+      if batch and (len(batch) >= self.sync_records or time.monotonic() >= deadline):
+        self._write(batch)
+        batch = []
+
+  def _write(self, batch):
+    if not batch:
+      return
+    try:
+      with self.lock:
+        self.conn.executemany(f"INSERT INTO trades ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", batch)
+        last_id = self.conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        self.conn.commit()
+      self.written += len(batch)
+      self.commits += 1
+    except Exception as e:
+      print('fail to write trade journal: ', e)
+      return
+    # the only writer inserts a batch in one transaction, so its ids are consecutive
+    rows = [dict(zip(('id',) + COLUMNS, (last_id - len(batch) + 1 + index,) + row)) for index, row in enumerate(batch)]
+    for listener in self.listeners:
+      try:
+        listener(rows)
+      except Exception as e:
+        print('trade journal listener failed: ', e)
+
+  def flush(self, timeout=5.0):
+    # blocks until every record queued so far is committed
+    if self.thread is None:
+      return
+    done = threading.Event()
+    self.queue.put(done)
+    done.wait(timeout)
+
+  def close(self):
+    if self.thread is not None:
+      self.queue.put(_STOP)
+      self.thread.join()
+      self.thread = None
+
+  def rows(self, after_id=0, limit=None) -> list:
+    # committed rows with id > after_id, oldest first, as dicts including id
+    query = f"SELECT id, {', '.join(COLUMNS)} FROM trades WHERE id > ? ORDER BY id"
+    if limit is not None:
+      query += f' LIMIT {int(limit)}'
+    with self.lock:
+      rows = self.conn.execute(query, (after_id,)).fetchall()
+    return [dict(zip(('id',) + COLUMNS, row)) for row in rows]
+
+  def export_csv(self, path) -> int:
+    # every committed row with a UTC ISO-8601 date; returns the row count
+    self.flush()
+    rows = self.rows()
+    with open(path, mode='w', newline='') as file:
+      writer = csv.writer(file)
+      writer.writerow(CSV_HEADER)
+      for row in rows:
+        date = datetime.fromtimestamp(row['ts'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        writer.writerow([date] + ['' if row[column] is None else row[column] for column in COLUMNS[1:]])
+    return len(rows)
+
+  def stats(self) -> dict:
+    return {
+      'records': self.records,
+      'written': self.written,
+      'queued': self.records - self.written,
+      'commits': self.commits,
+    }
+
+LEGACY_KINDS = {'swap_bome': 'buy', 'swap_sol': 'sell'}
+
+def import_csv(journal, path) -> int:
+  # appends the rows of an update_log-era transaction.csv; returns the row count
+  count = 0
+  with open(path, newline='') as file:
+    for row in csv.DictReader(file):
+      date = row['date'].rstrip('Z').replace('T', ' ')
+      ts = datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp()
+      signature = None if row['transaction_id'] in ('', '-') else row['transaction_id']
+      journal.record(LEGACY_KINDS.get(row['type'], row['type']), row['status'], signature=signature, amount=int(row['value']), ts=ts)
+      count += 1
+  journal.flush()
+  return count
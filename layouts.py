@@ -111,4 +111,40 @@ AMM_INFO_LAYOUT_V4 = cStruct(
     'amm_owner' / Bytes(32),
 
     'lpReserve' / Int64ul,
-)
\ No newline at end of file
+)
+
+# AMM_INFO_LAYOUT_V4 plus the trailing u64[3] padding of the on-chain account
+AMM_INFO_V4_ACCOUNT_SIZE = 752
+MARKET_STATE_LAYOUT_V3 = cStruct(
+    Padding(5),
+    'account_flags' / Int64ul,
+    'own_address' / Bytes(32),
+    'vault_signer_nonce' / Int64ul,
+    'base_mint' / Bytes(32),
+    'quote_mint' / Bytes(32),
+    'base_vault' / Bytes(32),
+    'base_deposits_total' / Int64ul,
+    'base_fees_accrued' / Int64ul,
+    'quote_vault' / Bytes(32),
+    'quote_deposits_total' / Int64ul,
+    'quote_fees_accrued' / Int64ul,
+    'quote_dust_threshold' / Int64ul,
+    'request_queue' / Bytes(32),
+    'event_queue' / Bytes(32),
+    'bids' / Bytes(32),
+    'asks' / Bytes(32),
+    'base_lot_size' / Int64ul,
+    'quote_lot_size' / Int64ul,
+    'fee_rate_bps' / Int64ul,
+    'referrer_rebate_accrued' / Int64ul,
+    Padding(7),
+)
+
+def layout_offset(layout, name):
+    # byte offset of a named field inside a fixed size cStruct
+    offset = 0
+    for subcon in layout.subcons:
+        if subcon.name == name:
+            return offset
+        offset += subcon.sizeof()
+    raise KeyError(name)
@@ -1,8 +1,15 @@
-import cmd, argparse, asyncio, platform
+import cmd, argparse, asyncio, os, platform, sys, threading, time
+from concurrent.futures import wait
 from solana_api import swap_bome, \
   swap_sol, \
   liquidity_info, \
-  spl_token
+  spl_token, \
+  warm_up, \
+  journal, \
+  analytics
+from journal import import_csv
+from trade_analytics import format_report, DIMENSIONS
+from cli_runtime import BackgroundLoop, CommandLatency, format_latency
 
 class CLI_Solana(cmd.Cmd):
   intro='''
@@ -14,13 +21,61 @@ class CLI_Solana(cmd.Cmd):
   =       2.   swap_bome_to_sol <amount:float>                    =
   =       3.   get_liquidity                                      =
   =       4.   create_token <file_path:str> <avatar_path:str>     =
-  =       5.   quit                                               =
+  =       5.   trade_report [--by mint|kind|hour]                 =
+  =       6.   latency                                            =
+  =       7.   quit                                               =
   =                                                               =
-  =       6.   help  <command_name>                               =
+  =       8.   help  <command_name>                               =
   =                                                               =
   =================================================================
   '''
   prompt='(solana_bot) '
+
+  def __init__(self, warm=True, pipelined=False, max_in_flight=4, stdin=None):
+    super().__init__(stdin=stdin)
+    if stdin is not None:
+      self.use_rawinput = False
+    # one loop for every command, so RPC connections and caches stay warm between them
+    self.runtime = BackgroundLoop()
+    self.latency = CommandLatency()
+    # batch mode: commands are submitted without waiting, at most max_in_flight at a time
+    self.pipelined = pipelined
+    self.in_flight = threading.Semaphore(max_in_flight)
+    self.pending = []
+    self.warming = None
+    if warm:
+      mints = [os.getenv('TOKEN_TARGET')] if os.getenv('TOKEN_TARGET') else []
+      self.warming = self.runtime.submit(warm_up(mints))
+
+  def execute(self, command, coro):
+    # runs a command coroutine on the background loop and records its latency
+    if not self.pipelined:
+      start_time = time.perf_counter()
+      try:
+        return self.runtime.run(coro)
+      finally:
+        self.latency.record(command, time.perf_counter() - start_time)
+    self.in_flight.acquire()
+    start_time = time.perf_counter()
+    future = self.runtime.submit(coro)
+
+    def done(future):
+      self.latency.record(command, time.perf_counter() - start_time)
+      self.in_flight.release()
+      if future.exception() is not None:
+        print(f'{command} failed: ', future.exception())
+
+    future.add_done_callback(done)
+    self.pending.append(future)
+    return future
+
+  def wait_pending(self):
+    pending, self.pending = self.pending, []
+    wait(pending)
+
+  def close(self):
+    self.wait_pending()
+    self.runtime.close()
   
   def do_help(self, arg: str) -> bool | None:
     return super().do_help(arg)
@@ -31,7 +86,7 @@ class CLI_Solana(cmd.Cmd):
     get_liquidity
     """
     try:
-      liquidity_info()
+      self.execute('get_liquidity', asyncio.to_thread(liquidity_info))
     except Exception as e:
       print('error: ', e)
   
@@ -45,7 +100,7 @@ class CLI_Solana(cmd.Cmd):
       parser.add_argument("amount", type=float, help="Amount of BOME tokens to swap")
       
       args = parser.parse_args(arg.split())
-      asyncio.run(swap_bome(args.amount))
+      self.execute('swap_sol_to_bome', swap_bome(args.amount))
       
     except Exception as e:
       print("Error parsing arguments:", e)
@@ -60,7 +115,7 @@ class CLI_Solana(cmd.Cmd):
       parser.add_argument("amount", type=float, help="Amount of BOME tokens to swap")
       
       args = parser.parse_args(arg.split())
-      asyncio.run(swap_sol(args.amount))
+      self.execute('swap_bome_to_sol', swap_sol(args.amount))
       
     except argparse.ArgumentError as e:
       print("Error parsing arguments:", e)
@@ -76,16 +131,93 @@ class CLI_Solana(cmd.Cmd):
       parser.add_argument("avatar_path", default='avatar.png', type=str, help="image file path for new token")
       
       args = parser.parse_args(arg.split())
-      asyncio.run(spl_token(args.file_path, args.avatar_path))
+      # spl_token creates the token with the blocking client, kept off the shared loop
+      self.execute('create_token', asyncio.to_thread(asyncio.run, spl_token(args.file_path, args.avatar_path)))
     except argparse.ArgumentError as e:
       print("Error parsing arguments:", e)
 
+  def do_trade_report(self, arg: str) -> bool | None:
+    """
+    Trade count, success rate, volume, fees and PnL from the trade journal.
+    trade_report [--by mint|kind|hour] [--rebuild] [--import <csv_path>] [--export <csv_path>]
+    """
+    try:
+      parser = argparse.ArgumentParser(description="Trade report")
+      parser.add_argument("--by", choices=DIMENSIONS, help="group the report by mint, kind or hour")
+      parser.add_argument("--rebuild", action="store_true", help="recompute the totals from the whole journal")
+      parser.add_argument("--import", dest="import_path", help="append the rows of an old transaction.csv first")
+      parser.add_argument("--export", dest="export_path", help="write the journal to a csv file")
+
+      args = parser.parse_args(arg.split())
+      if args.import_path:
+        print(f'imported {import_csv(journal, args.import_path)} rows')
+      if args.export_path:
+        print(f'exported {journal.export_csv(args.export_path)} rows')
+      journal.flush()
+      if args.rebuild:
+        analytics.rebuild()
+      print(format_report(analytics.report(args.by), args.by))
+    except SystemExit:
+      pass
+    except Exception as e:
+      print('error: ', e)
+
+  def do_wait(self, arg: str) -> bool | None:
+    """
+    Batch mode: wait until every command submitted so far is done.
+    wait
+    """
+    self.wait_pending()
+
+  def do_latency(self, arg: str) -> bool | None:
+    """
+    Latency of each command, first invocation against the later ones.
+    latency
+    """
+    if self.warming is not None and self.warming.done():
+      print('warm up ' + ('complete' if not self.warming.result() else f'incomplete: {", ".join(self.warming.result())}'))
+    print(format_latency(self.latency.report()))
+
   def do_quit(self, arg: str) -> bool | None:
     print('Thanks for your attention.')
     return True
-  
+
+  def do_EOF(self, arg: str) -> bool | None:
+    return True
+
+def run_batch(cli):
+  # one command per line; blank lines and lines starting with # are skipped
+  if cli.warming is not None:
+    cli.warming.result()
+  for line in cli.stdin:
+    line = line.strip()
+    if not line or line.startswith('#'):
+      continue
+    if cli.onecmd(line):
+      break
+  cli.wait_pending()
+  cli.do_latency('')
+
 if __name__ == "__main__":
     if platform.system() == 'Windows':
       asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-      
-    CLI_Solana().cmdloop()
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Solana trading bot CLI")
+    parser.add_argument("--batch", metavar="PATH", help="run the commands in this file, - for stdin, instead of the prompt")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="batch commands running at the same time, 1 runs them in order")
+    parser.add_argument("--no-warm-up", dest="warm", action="store_false", help="skip connecting and preloading caches at start")
+    args = parser.parse_args()
+
+    if args.batch:
+      source = sys.stdin if args.batch == '-' else open(args.batch)
+      cli = CLI_Solana(warm=args.warm, pipelined=True, max_in_flight=args.max_in_flight, stdin=source)
+      try:
+        run_batch(cli)
+      finally:
+        cli.close()
+    else:
+      cli = CLI_Solana(warm=args.warm)
+      try:
+        cli.cmdloop()
+      finally:
+        cli.close()
\ No newline at end of file
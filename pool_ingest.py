@@ -0,0 +1,129 @@
+import codecs, json, time, requests
+from pool_store import POOL_KEY_FIELDS, POOL_DECIMAL_FIELDS
+
+RAYDIUM_POOLS_URL = 'https://api.raydium.io/v2/sdk/liquidity/mainnet.json'
+POOL_LISTS = ('official', 'unOfficial')
+POOL_FIELDS = [name for name, _ in POOL_KEY_FIELDS + POOL_DECIMAL_FIELDS]
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+class _ChunkReader:
+  """
+  Pull parser over a stream of byte chunks.
+  Only the unconsumed tail of the stream is kept in memory, so walking a
+  list holds at most one element plus one chunk.
+  """
+
+  def __init__(self, chunks):
+    self.chunks = iter(chunks)
+    self.utf8 = codecs.getincrementaldecoder('utf-8')()
+    self.buf = ''
+    self.pos = 0
+    self.eof = False
+
+  def fill(self) -> bool:
+    if self.eof:
+      return False
+    for chunk in self.chunks:
+      text = self.utf8.decode(chunk)
+      if text:
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+    self.eof = True
+    self.buf = self.buf[self.pos:] + self.utf8.decode(b'', final=True)
+    self.pos = 0
+    return False
+
+  def peek(self) -> str:
+    while True:
+      while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+        self.pos += 1
+      if self.pos < len(self.buf):
+        return self.buf[self.pos]
+      if not self.fill():
+        return ''
+
+  def take(self, *expected) -> str:
+    char = self.peek()
+    if char not in expected or char == '':
+      raise ValueError(f'malformed pool list: expected one of {expected}, got {char!r}')
+    self.pos += 1
+    return char
+
+  def value(self):
+    self.peek()
+    while True:
+      try:
+        value, end = _decoder.raw_decode(self.buf, self.pos)
+      except json.JSONDecodeError:
+        if not self.fill():
+          raise
+        continue
+      # a number ending at the buffer edge may continue in the next chunk
+      if end == len(self.buf) and self.fill():
+        continue
+      self.pos = end
+      return value
+
+def _iter_list(reader):
+  reader.take('[')
+  if reader.peek() == ']':
+    reader.pos += 1
+    return
+  while True:
+    pool = reader.value()
+    # a missing field makes the pool malformed; the store skips it instead of failing the walk
+    yield {name: pool.get(name) for name in POOL_FIELDS}
+    if reader.take(',', ']') == ']':
+      return
+
+def iter_pools(chunks, lists=POOL_LISTS):
+  # accepts raydium's mainnet.json object or a bare list of pools (legacy all_pools.json)
+  reader = _ChunkReader(chunks)
+  if reader.peek() == '[':
+    yield from _iter_list(reader)
+    return
+
+  reader.take('{')
+  if reader.peek() == '}':
+    return
+  while True:
+    key = reader.value()
+    reader.take(':')
+    if key in lists and reader.peek() == '[':
+      yield from _iter_list(reader)
+    else:
+      reader.value()
+    if reader.take(',', '}') == '}':
+      return
+
+def ingest_file(store, path, chunk_size=CHUNK_SIZE) -> int:
+  with open(path, 'rb') as file:
+    return store.build(iter_pools(iter(lambda: file.read(chunk_size), b'')))
+
+def refresh_url(store, url=RAYDIUM_POOLS_URL, chunk_size=CHUNK_SIZE):
+  # conditional download: returns None when the server list is unchanged, else (new, changed)
+  headers = {}
+  if not store.is_empty():
+    if store.get_meta('etag'):
+      headers['If-None-Match'] = store.get_meta('etag')
+    if store.get_meta('last_modified'):
+      headers['If-Modified-Since'] = store.get_meta('last_modified')
+
+  with requests.get(url, headers=headers, stream=True, timeout=30) as resp:
+    if resp.status_code == 304:
+      store.set_meta('refreshed_at', time.time())
+      return None
+    resp.raise_for_status()
+    pools = iter_pools(resp.iter_content(chunk_size))
+    if store.is_empty():
+      result = (store.build(pools), 0)
+    else:
+      result = store.merge(pools)
+    store.set_meta('etag', resp.headers.get('ETag', ''))
+    store.set_meta('last_modified', resp.headers.get('Last-Modified', ''))
+  store.set_meta('refreshed_at', time.time())
+  return result
@@ -0,0 +1,79 @@
+import threading, time
+from pool_ingest import refresh_url, RAYDIUM_POOLS_URL
+
+class PoolRefresher:
+  """
+  Keeps the pool index fresh without blocking lookups.
+  A daemon thread re-checks the raydium list every `interval` seconds with a
+  conditional request and merges new or changed pools. A lookup miss first
+  asks `miss_resolver` (a single pool lookup, e.g. on-chain) and only falls
+  back to a list refresh if the index is older than `miss_cooldown`.
+  """
+
+  def __init__(self, store, url=RAYDIUM_POOLS_URL, interval=600, miss_cooldown=60, miss_resolver=None):
+    self.store = store
+    self.url = url
+    self.interval = interval
+    self.miss_cooldown = miss_cooldown
+    self.miss_resolver = miss_resolver
+    self.refresh_lock = threading.Lock()
+    self.stopped = threading.Event()
+    self.thread = None
+
+  def age(self) -> float:
+    return time.time() - float(self.store.get_meta('refreshed_at') or 0)
+
+  def refresh(self):
+    # concurrent callers wait for the refresh in flight instead of starting another one
+    if not self.refresh_lock.acquire(blocking=False):
+      with self.refresh_lock:
+        return None
+    try:
+      start_time = time.perf_counter()
+      result = refresh_url(self.store, self.url)
+      if result is None:
+        print('pool list not modified since last refresh')
+      else:
+        print(f'pool list refreshed: {result[0]} new, {result[1]} changed in {time.perf_counter() - start_time:.2f}s')
+      return result
+    except Exception as e:
+      print('pool list refresh failed: ', e)
+      return None
+    finally:
+      self.refresh_lock.release()
+
+  def start(self):
+    if self.thread is not None and self.thread.is_alive():
+      return
+    self.stopped.clear()
+    self.thread = threading.Thread(target=self._run, name='pool-refresher', daemon=True)
+    self.thread.start()
+
+  def stop(self):
+    self.stopped.set()
+
+  def _run(self):
+    while not self.stopped.is_set():
+      if self.age() >= self.interval:
+        self.refresh()
+      self.stopped.wait(max(1, self.interval - self.age()))
+
+  def lookup(self, key: str):
+    pool_keys = self.store.get(key)
+    if pool_keys is not None:
+      return pool_keys
+
+    if self.miss_resolver is not None:
+      try:
+        pool_keys = self.miss_resolver(key)
+      except Exception as e:
+        print('pool lookup fallback failed: ', e)
+        pool_keys = None
+      if pool_keys is not None:
+        self.store.put(pool_keys)
+        return pool_keys
+
+    if self.age() >= self.miss_cooldown:
+      self.refresh()
+      return self.store.get(key)
+    return None
@@ -0,0 +1,233 @@
+import os, sqlite3, threading, time
+from solders.pubkey import Pubkey # type: ignore
+from typing import Tuple
+
+POOL_DB_FILE = 'all_pools.db'
+WSOL_MINT = 'So11111111111111111111111111111111111111112'
+
+# raydium mainnet.json key -> key returned by fetch_pool_keys
+POOL_KEY_FIELDS = [
+  ('id', 'amm_id'),
+  ('authority', 'authority'),
+  ('baseMint', 'base_mint'),
+  ('quoteMint', 'quote_mint'),
+  ('lpMint', 'lp_mint'),
+  ('openOrders', 'open_orders'),
+  ('targetOrders', 'target_orders'),
+  ('baseVault', 'base_vault'),
+  ('quoteVault', 'quote_vault'),
+  ('marketId', 'market_id'),
+  ('marketBaseVault', 'market_base_vault'),
+  ('marketQuoteVault', 'market_quote_vault'),
+  ('marketAuthority', 'market_authority'),
+  ('marketBids', 'bids'),
+  ('marketAsks', 'asks'),
+  ('marketEventQueue', 'event_queue'),
+]
+POOL_DECIMAL_FIELDS = [
+  ('baseDecimals', 'base_decimals'),
+  ('quoteDecimals', 'quote_decimals'),
+]
+
+_COLUMNS = [key for _, key in POOL_KEY_FIELDS] + [key for _, key in POOL_DECIMAL_FIELDS]
+_SELECT = 'SELECT ' + ', '.join(_COLUMNS) + ' FROM pools '
+_INSERT_BUILD = 'INSERT OR REPLACE INTO pools_build (rank, ' + ', '.join(_COLUMNS) + ') VALUES (' + ', '.join('?' * (len(_COLUMNS) + 1)) + ')'
+# new pools are appended after the existing ones, known pools are only rewritten when a key changed
+_UPSERT = 'INSERT INTO pools (' + ', '.join(_COLUMNS) + ') VALUES (' + ', '.join('?' * len(_COLUMNS)) + ') ' \
+  + 'ON CONFLICT (amm_id) DO UPDATE SET ' + ', '.join(f'{key} = excluded.{key}' for key in _COLUMNS[1:]) \
+  + ' WHERE ' + ' OR '.join(f'{key} IS NOT excluded.{key}' for key in _COLUMNS[1:])
+
+_CREATE_INDEXES = (
+  'CREATE INDEX IF NOT EXISTS pools_base_quote ON pools (base_mint, quote_mint)',
+  'CREATE INDEX IF NOT EXISTS pools_quote_base ON pools (quote_mint, base_mint)',
+)
+
+def _create_table(name) -> str:
+  return (
+    f'CREATE TABLE IF NOT EXISTS {name} (rank INTEGER PRIMARY KEY, amm_id BLOB NOT NULL UNIQUE, '
+    + ', '.join(f'{key} BLOB' for _, key in POOL_KEY_FIELDS[1:]) + ', '
+    + ', '.join(f'{key} INTEGER' for _, key in POOL_DECIMAL_FIELDS) + ')'
+  )
+
+class PoolStore:
+  """
+  On-disk index of raydium pool keys.
+  Pubkeys are stored as raw 32 byte blobs and looked up through the
+  (base_mint, quote_mint) / (quote_mint, base_mint) indexes or the amm id,
+  so a lookup never touches the rest of the pool list.
+  """
+
+  def __init__(self, path=POOL_DB_FILE, mmap_size=256 * 1024 * 1024):
+    self.path = path
+    self.lock = threading.Lock()
+    self.conn = sqlite3.connect(path, check_same_thread=False)
+    self.conn.execute('PRAGMA journal_mode=WAL')
+    self.conn.execute('PRAGMA synchronous=NORMAL')
+    self.conn.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+    self.conn.execute(_create_table('pools'))
+    for index in _CREATE_INDEXES:
+      self.conn.execute(index)
+    self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    self.conn.commit()
+
+    self.build_time = float(self.get_meta('build_time') or 0)
+    self.skipped = 0
+    self.lookups = 0
+    self.lookup_time = 0.0
+    self.last_lookup_time = 0.0
+
+  def get_meta(self, key):
+    with self.lock:
+      row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+  def set_meta(self, key, value):
+    with self.lock:
+      self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+      self.conn.commit()
+
+  def count(self) -> int:
+    with self.lock:
+      return self.conn.execute('SELECT COUNT(*) FROM pools').fetchone()[0]
+
+  def is_empty(self) -> bool:
+    with self.lock:
+      return self.conn.execute('SELECT 1 FROM pools LIMIT 1').fetchone() is None
+
+  def build(self, pools, batch_size=5000) -> int:
+    # pools: iterable of raydium mainnet.json pool dicts, in list order. They are written to a
+    # side table that replaces the index in one transaction, so readers never see a partial
+    # index and a failed build leaves the old one in place
+    start_time = time.perf_counter()
+    skipped = self.skipped
+    with self.lock:
+      self.conn.execute('DROP TABLE IF EXISTS pools_build')
+      self.conn.execute(_create_table('pools_build'))
+      self.conn.commit()
+    total = 0
+    try:
+      for batch in _batches(pools, batch_size):
+        rows = self._rows(batch)
+        with self.lock:
+          self.conn.executemany(_INSERT_BUILD, [(total + index,) + row for index, row in enumerate(rows)])
+          self.conn.commit()
+        total += len(rows)
+      with self.lock:
+        self.conn.execute('BEGIN')
+        try:
+          self.conn.execute('DROP TABLE pools')
+          self.conn.execute('ALTER TABLE pools_build RENAME TO pools')
+          for index in _CREATE_INDEXES:
+            self.conn.execute(index)
+          self.conn.commit()
+        except Exception:
+          self.conn.rollback()
+          raise
+    except Exception:
+      with self.lock:
+        self.conn.execute('DROP TABLE IF EXISTS pools_build')
+        self.conn.commit()
+      raise
+    with self.lock:
+      self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    self.build_time = time.perf_counter() - start_time
+    self.set_meta('build_time', self.build_time)
+    print(f'pool index built: {total} pools ({self.skipped - skipped} malformed skipped) in {self.build_time:.2f}s, {self.file_size() / 1e6:.1f} MB')
+    return total
+
+  def merge(self, pools, batch_size=5000) -> Tuple[int, int]:
+    # upsert raydium pool dicts, returns (new pools, changed pools)
+    before = self.count()
+    touched = 0
+    for batch in _batches(pools, batch_size):
+      with self.lock:
+        changes = self.conn.total_changes
+        self.conn.executemany(_UPSERT, self._rows(batch))
+        self.conn.commit()
+        touched += self.conn.total_changes - changes
+    added = self.count() - before
+    return added, touched - added
+
+  def _rows(self, pools) -> list:
+    # rows of the well-formed pools; a malformed one is counted and left out
+    rows = []
+    for pool in pools:
+      try:
+        rows.append(_pool_row(pool))
+      except Exception:
+        self.skipped += 1
+    return rows
+
+  def put(self, pool_keys: dict):
+    # cache a single pool resolved elsewhere, in fetch_pool_keys format
+    row = tuple(bytes(pool_keys[key]) for _, key in POOL_KEY_FIELDS) \
+      + tuple(int(pool_keys[key]) for _, key in POOL_DECIMAL_FIELDS)
+    with self.lock:
+      self.conn.execute(_UPSERT, row)
+      self.conn.commit()
+
+  def get(self, key: str):
+    # key is a token mint paired with SOL, or an amm id
+    start_time = time.perf_counter()
+    try:
+      raw = bytes(Pubkey.from_string(key))
+    except Exception:
+      return None
+    wsol = bytes(Pubkey.from_string(WSOL_MINT))
+    with self.lock:
+      row = self.conn.execute(
+        _SELECT + 'WHERE base_mint = ? AND quote_mint = ? ORDER BY rank LIMIT 1', (raw, wsol)
+      ).fetchone()
+      if row is None:
+        row = self.conn.execute(
+          _SELECT + 'WHERE quote_mint = ? AND base_mint = ? ORDER BY rank LIMIT 1', (raw, wsol)
+        ).fetchone()
+      if row is None:
+        row = self.conn.execute(_SELECT + 'WHERE amm_id = ?', (raw,)).fetchone()
+    self.last_lookup_time = time.perf_counter() - start_time
+    self.lookups += 1
+    self.lookup_time += self.last_lookup_time
+    if row is None:
+      return None
+    return _row_to_pool_keys(row)
+
+  def file_size(self) -> int:
+    size = 0
+    for suffix in ('', '-wal'):
+      if os.path.isfile(self.path + suffix):
+        size += os.path.getsize(self.path + suffix)
+    return size
+
+  def stats(self) -> dict:
+    return {
+      'pools': self.count(),
+      'file_size': self.file_size(),
+      'build_time': self.build_time,
+      'skipped': self.skipped,
+      'lookups': self.lookups,
+      'avg_lookup_ms': self.lookup_time / self.lookups * 1000 if self.lookups else 0.0,
+      'last_lookup_ms': self.last_lookup_time * 1000,
+    }
+
+def _batches(items, size):
+  batch = []
+  for item in items:
+    batch.append(item)
+    if len(batch) >= size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+def _pool_row(pool: dict) -> tuple:
+  return tuple(bytes(Pubkey.from_string(pool[name])) for name, _ in POOL_KEY_FIELDS) \
+    + tuple(int(pool[name]) for name, _ in POOL_DECIMAL_FIELDS)
+
+def _row_to_pool_keys(row) -> dict:
+  keys = {}
+  for index, key in enumerate(_COLUMNS):
+    if index < len(POOL_KEY_FIELDS):
+      keys[key] = Pubkey.from_bytes(row[index])
+    else:
+      keys[key] = row[index]
+  return keys
@@ -0,0 +1,206 @@
+import asyncio, heapq, itertools, time
+
+LAMPORTS_PER_SOL = 1000000000
+
+class Position:
+  """
+  One exit waiting on a vault balance. Thresholds are in SOL held by `vault`,
+  the same unit liquidity_remove's take_profit uses. `trailing` is the
+  fraction below the highest balance seen that trips the stop.
+  `exit` is an async callable run once, with the position, when a rule trips.
+  """
+
+  def __init__(self, vault, exit, take_profit=None, stop_loss=None, trailing=None, kind='sell', label=None):
+    self.vault = str(vault)
+    self.exit = exit
+    self.take_profit = take_profit
+    self.stop_loss = stop_loss
+    self.trailing = trailing
+    self.kind = kind
+    self.label = label
+
+    self.active = False
+    self.peak = None
+    self.reason = None
+    self.lamports = None
+    self.triggered_at = None
+    self.future = None
+
+  def __repr__(self):
+    return f'Position({self.kind}, {self.vault if self.label is None else self.label}, tp={self.take_profit}, sl={self.stop_loss}, trailing={self.trailing})'
+
+class _VaultRules:
+  # per-vault heaps ordered by how close each rule is to tripping
+  def __init__(self):
+    self.take_profit = []  # (threshold, seq, position)           lowest threshold first
+    self.stop_loss = []    # (-threshold, seq, position)          highest threshold first
+    self.peaks = []        # (peak, seq, position)                lowest peak first
+    self.trailing = []     # (-stop, seq, peak, position)         highest stop first
+    self.count = 0
+    self.take_profit_count = 0
+    self.stop_loss_count = 0
+    self.trailing_count = 0
+    self.callback = None
+
+class PositionMonitor:
+  """
+  Evaluates take-profit, stop-loss and trailing rules of many positions
+  against a VaultWatcher stream. Each watched vault gets one callback; its
+  rules sit in heaps keyed by trigger level, so an update only touches the
+  positions that trip or whose trailing peak rises. Stale heap entries are
+  dropped lazily when they surface, and a heap is rebuilt once its stale
+  entries outnumber the live ones.
+  """
+
+  def __init__(self, watcher):
+    self.watcher = watcher
+    self.vaults = {}
+    self.seq = itertools.count()
+
+    self.updates = 0
+    self.checks = 0
+    self.triggered = 0
+    self.exits_failed = 0
+
+  def add(self, position: Position) -> asyncio.Future:
+    # the future resolves to the exit's result once a rule trips
+    loop = asyncio.get_running_loop()
+    position.future = loop.create_future()
+    position.active = True
+    rules = self.vaults.get(position.vault)
+    if rules is None:
+      rules = self.vaults[position.vault] = _VaultRules()
+      rules.callback = self._callback(position.vault)
+      self.watcher.watch(position.vault, rules.callback)
+    rules.count += 1
+
+    seq = next(self.seq)
+    if position.take_profit is not None:
+      rules.take_profit_count += 1
+      heapq.heappush(rules.take_profit, (round(position.take_profit * LAMPORTS_PER_SOL), seq, position))
+    if position.stop_loss is not None:
+      rules.stop_loss_count += 1
+      heapq.heappush(rules.stop_loss, (-round(position.stop_loss * LAMPORTS_PER_SOL), seq, position))
+    if position.trailing is not None:
+      rules.trailing_count += 1
+      position.peak = self.watcher.lamports.get(position.vault, 0)
+      self._push_trailing(rules, position, seq)
+
+    # check against the last balance seen so an already-met rule fires now
+    lamports = self.watcher.lamports.get(position.vault)
+    if lamports is not None:
+      self._evaluate(position.vault, lamports)
+    return position.future
+
+  def remove(self, position: Position):
+    if not position.active:
+      return
+    position.active = False
+    if not position.future.done():
+      position.future.cancel()
+    self._release(position)
+
+  def _release(self, position):
+    rules = self.vaults.get(position.vault)
+    if rules is None:
+      return
+    rules.count -= 1
+    if position.take_profit is not None:
+      rules.take_profit_count -= 1
+    if position.stop_loss is not None:
+      rules.stop_loss_count -= 1
+    if position.trailing is not None:
+      rules.trailing_count -= 1
+    if rules.count == 0:
+      del self.vaults[position.vault]
+      self.watcher.unwatch(position.vault, rules.callback)
+    else:
+      self._compact(rules)
+
+  def _callback(self, vault):
+    def on_update(lamports):
+      self.updates += 1
+      self._evaluate(vault, lamports)
+    return on_update
+
+  def _push_trailing(self, rules, position, seq):
+    stop = position.peak * (1 - position.trailing)
+    heapq.heappush(rules.peaks, (position.peak, seq, position))
+    heapq.heappush(rules.trailing, (-stop, seq, position.peak, position))
+
+  def _evaluate(self, vault, lamports):
+    rules = self.vaults.get(vault)
+    if rules is None:
+      return
+
+    while rules.take_profit and rules.take_profit[0][0] <= lamports:
+      self.checks += 1
+      self._trip(heapq.heappop(rules.take_profit)[2], lamports, 'take_profit')
+
+    while rules.stop_loss and -rules.stop_loss[0][0] >= lamports:
+      self.checks += 1
+      self._trip(heapq.heappop(rules.stop_loss)[2], lamports, 'stop_loss')
+
+    # raise trailing peaks below the new balance; their old stop entries go stale
+    while rules.peaks and rules.peaks[0][0] < lamports:
+      self.checks += 1
+      _, seq, position = heapq.heappop(rules.peaks)
+      if position.active:
+        position.peak = lamports
+        self._push_trailing(rules, position, seq)
+
+    while rules.trailing and -rules.trailing[0][0] >= lamports:
+      self.checks += 1
+      _, _, peak, position = heapq.heappop(rules.trailing)
+      if position.active and peak == position.peak and peak > 0:
+        self._trip(position, lamports, 'trailing')
+
+    self._compact(rules)
+
+  def _compact(self, rules):
+    # removed positions and raised peaks leave stale entries behind; drop them before they pile up
+    if len(rules.take_profit) > 2 * max(rules.take_profit_count, 1):
+      rules.take_profit = [entry for entry in rules.take_profit if entry[2].active]
+      heapq.heapify(rules.take_profit)
+    if len(rules.stop_loss) > 2 * max(rules.stop_loss_count, 1):
+      rules.stop_loss = [entry for entry in rules.stop_loss if entry[2].active]
+      heapq.heapify(rules.stop_loss)
+    if len(rules.trailing) > 2 * max(rules.trailing_count, 1):
+      rules.trailing = [entry for entry in rules.trailing if entry[3].active and entry[2] == entry[3].peak]
+      rules.peaks = [entry for entry in rules.peaks if entry[2].active]
+      heapq.heapify(rules.trailing)
+      heapq.heapify(rules.peaks)
+
+  def _trip(self, position, lamports, reason):
+    if not position.active:
+      return
+    position.triggered_at = time.perf_counter()
+    position.active = False
+    position.reason = reason
+    position.lamports = lamports
+    self.triggered += 1
+    self._release(position)
+    print(f'{reason} hit for {position}: {lamports / LAMPORTS_PER_SOL} SOL')
+    asyncio.get_running_loop().create_task(self._dispatch(position))
+
+  async def _dispatch(self, position):
+    try:
+      result = await position.exit(position)
+    except Exception as e:
+      self.exits_failed += 1
+      print('position exit failed: ', e)
+      if not position.future.done():
+        position.future.set_exception(e)
+      return
+    if not position.future.done():
+      position.future.set_result(result)
+
+  def stats(self) -> dict:
+    return {
+      'positions': sum(rules.count for rules in self.vaults.values()),
+      'vaults': len(self.vaults),
+      'updates': self.updates,
+      'checks': self.checks,
+      'triggered': self.triggered,
+      'exits_failed': self.exits_failed,
+    }
@@ -0,0 +1,402 @@
+import asyncio, base64, json, random, threading, time
+import websockets
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from solders.hash import Hash # type: ignore
+from solders.keypair import Keypair # type: ignore
+from solders.transaction import Transaction as SoldersTransaction # type: ignore
+from spl.token._layouts import ACCOUNT_LAYOUT, MINT_LAYOUT
+from spl.token.constants import TOKEN_PROGRAM_ID, WRAPPED_SOL_MINT
+
+from layouts import AMM_INFO_LAYOUT_V4, AMM_INFO_V4_ACCOUNT_SIZE
+
+class InjectedFailure(Exception):
+  pass
+
+def _per_method(setting, method):
+  # a number for every method, or {method: number} with an optional 'default'
+  if isinstance(setting, dict):
+    return setting.get(method, setting.get('default', 0.0))
+  return setting
+
+class _Server(ThreadingHTTPServer):
+  # the default listen backlog of 5 drops bursts of new connections into a 1 s SYN retry
+  request_queue_size = 512
+
+class RpcStandIn:
+  """
+  Local solana JSON-RPC server for measuring the swap paths without mainnet.
+  It serves the methods buy/sell use from an in-memory account table, with
+  `latency` seconds (or a per-method dict) injected before every answer.
+  `failure_rate` (a fraction, or a per-method dict) answers that share of
+  calls with a JSON-RPC error instead. Of the transactions it accepts,
+  `drop_rate` never land and `transaction_error_rate` land with an
+  instruction error. With `blocks_per_second` the block height advances in
+  real time, so dropped transactions eventually expire. Landed transactions
+  report `confirmed` until they are `finalize_after` seconds old.
+  """
+
+  def __init__(self, latency=0.0, host='127.0.0.1', port=0, failure_rate=0.0, drop_rate=0.0,
+               transaction_error_rate=0.0, blocks_per_second=0.0, finalize_after=0.0, seed=None):
+    self.latency = latency
+    self.failure_rate = failure_rate
+    self.drop_rate = drop_rate
+    self.transaction_error_rate = transaction_error_rate
+    self.blocks_per_second = blocks_per_second
+    self.finalize_after = finalize_after
+    self.random = random.Random(seed)
+    self.started_at = time.monotonic()
+    self.failures = Counter()
+    self.accounts = {}
+    self.signatures = {}
+    self.calls = Counter()
+    self.slot = 1000
+    self.compute_units_base = 20000
+    self.compute_units_per_instruction = 6000
+    # per-slot fees served by getRecentPrioritizationFees, oldest first
+    self.priority_fees = [0] * 100 + [10000] * 40 + [50000] * 10
+    self.base_block_height = 900
+    self.blockhash = Hash.new_unique()
+    self.lock = threading.Lock()
+    self.server = _Server((host, port), _make_handler(self))
+    self.server.daemon_threads = True
+    self.thread = None
+    self.ws_loop = None
+    self.ws_server = None
+    self.ws_clients = {}
+    self.subscription_id = 0
+
+  @property
+  def url(self) -> str:
+    host, port = self.server.server_address[:2]
+    return f'http://{host}:{port}'
+
+  def start(self):
+    self.thread = threading.Thread(target=self.server.serve_forever, name='rpc-standin', daemon=True)
+    self.thread.start()
+    return self
+
+  def stop(self):
+    self.server.shutdown()
+    self.server.server_close()
+    if self.ws_loop is not None:
+      self.ws_loop.call_soon_threadsafe(self.ws_server.close)
+      self.ws_loop.call_soon_threadsafe(self.ws_loop.stop)
+
+  # ---- websocket
+
+  def start_websocket(self, host='127.0.0.1', port=0):
+    # accountSubscribe endpoint, served from its own event loop thread
+    self.ws_loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+      asyncio.set_event_loop(self.ws_loop)
+      self.ws_server = self.ws_loop.run_until_complete(websockets.serve(self._ws_handler, host, port))
+      ready.set()
+      self.ws_loop.run_forever()
+
+    threading.Thread(target=run, name='rpc-standin-ws', daemon=True).start()
+    ready.wait()
+    return self
+
+  @property
+  def ws_url(self) -> str:
+    host, port = self.ws_server.sockets[0].getsockname()[:2]
+    return f'ws://{host}:{port}'
+
+  async def _ws_handler(self, websocket, path=None):
+    subscriptions = {}
+    self.ws_clients[websocket] = subscriptions
+    try:
+      async for message in websocket:
+        request = json.loads(message)
+        with self.lock:
+          self.calls[request['method']] += 1
+        await asyncio.sleep(self.delay(request['method']))
+        if request['method'] == 'accountSubscribe':
+          self.subscription_id += 1
+          subscriptions[self.subscription_id] = request['params'][0]
+          result = self.subscription_id
+        else:
+          result = subscriptions.pop(request['params'][0], None) is not None
+        await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': result}))
+    finally:
+      del self.ws_clients[websocket]
+
+  async def _notify(self, key):
+    for websocket, subscriptions in list(self.ws_clients.items()):
+      for subscription, watched in list(subscriptions.items()):
+        if watched == key:
+          await websocket.send(json.dumps({'jsonrpc': '2.0', 'method': 'accountNotification', 'params': {
+            'result': self._context(self._encode(key, {})), 'subscription': subscription,
+          }}))
+
+  def set_lamports(self, pubkey, lamports):
+    # change an account balance and push it to websocket subscribers
+    self.accounts[str(pubkey)]['lamports'] = lamports
+    if self.ws_loop is not None:
+      asyncio.run_coroutine_threadsafe(self._notify(str(pubkey)), self.ws_loop).result()
+
+  def set_token_amount(self, pubkey, amount):
+    # change a token account balance and push it to websocket subscribers
+    account = self.accounts[str(pubkey)]
+    parsed = ACCOUNT_LAYOUT.parse(account['data'])
+    parsed.amount = amount
+    account['data'] = ACCOUNT_LAYOUT.build(parsed)
+    token_amount = account['parsed']['parsed']['info']['tokenAmount']
+    token_amount.update(amount=str(amount), uiAmount=amount / 10 ** token_amount['decimals'])
+    token_amount['uiAmountString'] = str(token_amount['uiAmount'])
+    if self.ws_loop is not None:
+      asyncio.run_coroutine_threadsafe(self._notify(str(pubkey)), self.ws_loop).result()
+
+  def drop_websockets(self):
+    # simulate a websocket outage for every connected client
+    async def close_all():
+      for websocket in list(self.ws_clients):
+        await websocket.close()
+    asyncio.run_coroutine_threadsafe(close_all(), self.ws_loop).result()
+
+  def delay(self, method: str) -> float:
+    return _per_method(self.latency, method)
+
+  def fails(self, method: str) -> bool:
+    rate = _per_method(self.failure_rate, method)
+    with self.lock:
+      failed = rate > 0 and self.random.random() < rate
+      if failed:
+        self.failures[method] += 1
+    return failed
+
+  @property
+  def block_height(self) -> int:
+    return self.base_block_height + int((time.monotonic() - self.started_at) * self.blocks_per_second)
+
+  def advance_blocks(self, count):
+    self.base_block_height += count
+
+  # ---- account table
+
+  def add_account(self, pubkey, data: bytes, owner=TOKEN_PROGRAM_ID, lamports=2039280, parsed=None):
+    self.accounts[str(pubkey)] = {'data': bytes(data), 'owner': str(owner), 'lamports': lamports, 'parsed': parsed}
+
+  def add_mint(self, mint, decimals=9, owner=TOKEN_PROGRAM_ID):
+    parsed = {
+      'program': 'spl-token',
+      'parsed': {'type': 'mint', 'info': {'decimals': decimals, 'freezeAuthority': None, 'isInitialized': True, 'mintAuthority': None, 'supply': '0'}},
+      'space': 82,
+    }
+    data = MINT_LAYOUT.build(dict(
+      mint_authority_option=0, mint_authority=bytes(32), supply=0, decimals=decimals,
+      is_initialized=1, freeze_authority_option=0, freeze_authority=bytes(32),
+    ))
+    self.add_account(mint, data, owner=owner, lamports=1461600, parsed=parsed)
+
+  def add_token_account(self, pubkey, mint, owner, amount=0, decimals=9):
+    data = ACCOUNT_LAYOUT.build(dict(
+      mint=bytes(mint), owner=bytes(owner), amount=amount,
+      delegate_option=0, delegate=bytes(32), state=1,
+      is_native_option=0, is_native=0, delegated_amount=0,
+      close_authority_option=0, close_authority=bytes(32),
+    ))
+    parsed = {
+      'program': 'spl-token',
+      'parsed': {'type': 'account', 'info': {
+        'isNative': False, 'mint': str(mint), 'owner': str(owner), 'state': 'initialized',
+        'tokenAmount': {'amount': str(amount), 'decimals': decimals, 'uiAmount': amount / 10 ** decimals, 'uiAmountString': str(amount / 10 ** decimals)},
+      }},
+      'space': ACCOUNT_LAYOUT.sizeof(),
+    }
+    self.add_account(pubkey, data, parsed=parsed)
+
+  def add_pool(self, mint, owner, decimals=6, base_reserve=10 ** 15, quote_reserve=50 * 10 ** 9, wallet_amount=10 ** 12) -> dict:
+    # a synthetic mint/SOL raydium pool plus the wallet's token account, returns fetch_pool_keys style keys
+    keys = {name: Keypair().pubkey() for name in (
+      'amm_id', 'authority', 'lp_mint', 'open_orders', 'target_orders', 'base_vault', 'quote_vault',
+      'market_id', 'market_base_vault', 'market_quote_vault', 'market_authority', 'bids', 'asks', 'event_queue',
+    )}
+    keys.update(base_mint=mint, base_decimals=decimals, quote_mint=WRAPPED_SOL_MINT, quote_decimals=9)
+
+    amm = {subcon.name: 0 for subcon in AMM_INFO_LAYOUT_V4.subcons}
+    for name in ('base_vault', 'quote_vault', 'base_mint', 'quote_mint', 'lp_mint', 'open_orders', 'market_id', 'target_orders'):
+      amm[name] = bytes(keys[name])
+    for name in ('serum_program_id', 'withdraw_queue', 'lp_vault', 'amm_owner'):
+      amm[name] = bytes(32)
+    amm.update(status=6, base_decimal=decimals, quote_decimal=9, trade_fee_numerator=25, trade_fee_denominator=10000,
+               swap_fee_numerator=25, swap_fee_denominator=10000)
+    data = AMM_INFO_LAYOUT_V4.build(amm)
+    self.add_account(keys['amm_id'], data + bytes(AMM_INFO_V4_ACCOUNT_SIZE - len(data)), owner=Keypair().pubkey())
+
+    self.add_mint(mint, decimals)
+    self.add_mint(WRAPPED_SOL_MINT, 9)
+    self.add_token_account(keys['base_vault'], mint, keys['authority'], base_reserve, decimals)
+    self.add_token_account(keys['quote_vault'], WRAPPED_SOL_MINT, keys['authority'], quote_reserve, 9)
+    self.add_token_account(Keypair().pubkey(), mint, owner, wallet_amount, decimals)
+    return keys
+
+  # ---- json-rpc
+
+  def handle(self, method: str, params: list):
+    with self.lock:
+      self.calls[method] += 1
+    if self.fails(method):
+      raise InjectedFailure(f'injected failure in {method}')
+    handler = getattr(self, '_rpc_' + method, None)
+    if handler is None:
+      raise NotImplementedError(method)
+    return handler(*params)
+
+  def _context(self, value):
+    return {'context': {'slot': self.slot, 'apiVersion': '1.18.0'}, 'value': value}
+
+  def _encode(self, pubkey: str, config: dict):
+    account = self.accounts.get(pubkey)
+    if account is None:
+      return None
+    if config.get('encoding') == 'jsonParsed' and account['parsed'] is not None:
+      data = account['parsed']
+    else:
+      data = [base64.b64encode(account['data']).decode(), 'base64']
+    return {'data': data, 'executable': False, 'lamports': account['lamports'], 'owner': account['owner'],
+            'rentEpoch': 0, 'space': len(account['data'])}
+
+  def _rpc_getAccountInfo(self, pubkey, config=None):
+    return self._context(self._encode(pubkey, config or {}))
+
+  def _rpc_getMultipleAccounts(self, pubkeys, config=None):
+    return self._context([self._encode(pubkey, config or {}) for pubkey in pubkeys])
+
+  def _rpc_getBalance(self, pubkey, config=None):
+    account = self.accounts.get(pubkey)
+    return self._context(account['lamports'] if account else 0)
+
+  def _rpc_getMinimumBalanceForRentExemption(self, size, config=None):
+    return (size + 128) * 6960
+
+  def _rpc_getTokenAccountsByOwner(self, owner, opts, config=None):
+    config = config or {}
+    accounts = []
+    for pubkey, account in self.accounts.items():
+      if account['parsed'] is None or account['parsed']['parsed']['type'] != 'account':
+        continue
+      info = account['parsed']['parsed']['info']
+      if info['owner'] != owner:
+        continue
+      if 'mint' in opts and info['mint'] != opts['mint']:
+        continue
+      if 'programId' in opts and account['owner'] != opts['programId']:
+        continue
+      accounts.append({'pubkey': pubkey, 'account': self._encode(pubkey, config)})
+    return self._context(accounts)
+
+  def _rpc_getLatestBlockhash(self, config=None):
+    return self._context({'blockhash': str(self.blockhash), 'lastValidBlockHeight': self.block_height + 150})
+
+  def _rpc_getBlockHeight(self, config=None):
+    return self.block_height
+
+  def _rpc_getSlot(self, config=None):
+    return self.slot
+
+  def _rpc_simulateTransaction(self, tx, config=None):
+    # a fixed cost per instruction stands in for the runtime's metering
+    txn = SoldersTransaction.from_bytes(base64.b64decode(tx))
+    return self._context({
+      'err': None, 'logs': [], 'accounts': None, 'returnData': None,
+      'unitsConsumed': self.compute_units_base + self.compute_units_per_instruction * len(txn.message.instructions),
+    })
+
+  def _rpc_getRecentPrioritizationFees(self, accounts=None):
+    # one entry per recent slot, as a node reports them
+    return [{'slot': self.slot - index, 'prioritizationFee': fee} for index, fee in enumerate(reversed(self.priority_fees))]
+
+  def _rpc_sendTransaction(self, tx, config=None):
+    txn = SoldersTransaction.from_bytes(base64.b64decode(tx))
+    signature = str(txn.signatures[0])
+    with self.lock:
+      if signature in self.signatures:
+        return signature
+      roll = self.random.random()
+      if roll < self.drop_rate:
+        # accepted but never lands, like a send that missed the leader
+        self.failures['dropped'] += 1
+        return signature
+      self.slot += 1
+      err = None
+      if roll < self.drop_rate + self.transaction_error_rate:
+        self.failures['transaction_error'] += 1
+        err = {'InstructionError': [2, {'Custom': 30}]}
+      self.signatures[signature] = {'slot': self.slot, 'message': txn.message, 'err': err, 'landed_at': time.monotonic()}
+    return signature
+
+  def _rpc_getSignatureStatuses(self, signatures, config=None):
+    statuses = []
+    now = time.monotonic()
+    for signature in signatures:
+      sent = self.signatures.get(signature)
+      statuses.append(None if sent is None else {
+        'slot': sent['slot'], 'confirmations': None, 'err': sent['err'],
+        'status': {'Ok': None} if sent['err'] is None else {'Err': sent['err']},
+        'confirmationStatus': 'finalized' if now - sent['landed_at'] >= self.finalize_after else 'confirmed',
+      })
+    return self._context(statuses)
+
+  def _rpc_getTransaction(self, signature, config=None):
+    sent = self.signatures.get(signature)
+    if sent is None:
+      return None
+    message = sent['message']
+    return {
+      'slot': sent['slot'],
+      'blockTime': int(time.time()),
+      'transaction': {
+        'signatures': [signature],
+        'message': {
+          'accountKeys': [str(key) for key in message.account_keys],
+          'header': {
+            'numRequiredSignatures': message.header.num_required_signatures,
+            'numReadonlySignedAccounts': message.header.num_readonly_signed_accounts,
+            'numReadonlyUnsignedAccounts': message.header.num_readonly_unsigned_accounts,
+          },
+          'recentBlockhash': str(message.recent_blockhash),
+          'instructions': [],
+        },
+      },
+      'meta': {
+        'err': sent['err'], 'status': {'Ok': None} if sent['err'] is None else {'Err': sent['err']}, 'fee': 5000, 'preBalances': [], 'postBalances': [],
+        'innerInstructions': [], 'logMessages': [], 'preTokenBalances': [], 'postTokenBalances': [],
+        'rewards': [], 'computeUnitsConsumed': 0,
+      },
+    }
+
+def _make_handler(standin):
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in one segment, otherwise keep-alive clients stall on delayed acks
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def log_message(self, format, *args):
+      pass
+
+    def do_POST(self):
+      request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+      time.sleep(standin.delay(request['method']))
+      try:
+        body = {'jsonrpc': '2.0', 'id': request['id'], 'result': standin.handle(request['method'], request.get('params', []))}
+      except InjectedFailure as e:
+        # what a node that fell behind answers
+        body = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -32005, 'message': str(e), 'data': {'numSlotsBehind': 42}}}
+      except Exception as e:
+        # solders only parses some error codes without a data field; internal error is one of them
+        body = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -32603, 'message': str(e)}}
+      payload = json.dumps(body).encode()
+      self.send_response(200)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(payload)))
+      self.end_headers()
+      self.wfile.write(payload)
+      self.wfile.flush()
+
+  return Handler
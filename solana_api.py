@@ -1,12 +1,12 @@
-import asyncio, os, time, csv, pytz, json
-from datetime import datetime
+import asyncio, atexit, os, time, json, weakref
 from dotenv import load_dotenv
 
 from solana.rpc.api import Client
 from solana.rpc.api import RPCException
+from solana.rpc.core import TransactionExpiredBlockheightExceededError
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.types import TokenAccountOpts, TxOpts
-from solana.rpc.commitment import Commitment, Confirmed
+from solana.rpc.commitment import Commitment
 from solana.transaction import AccountMeta, Transaction
 
 from solders.pubkey import Pubkey # type: ignore
@@ -16,7 +16,6 @@ from solders.compute_budget import set_compute_unit_price, set_compute_unit_limi
 from solders.system_program import create_account, CreateAccountParams
 
 from spl.token.constants import WRAPPED_SOL_MINT, TOKEN_PROGRAM_ID, MINT_LEN
-from spl.token.client import Token
 from spl.token.core import _TokenCore
 from spl.token.instructions import create_associated_token_account, \
   get_associated_token_address, \
@@ -26,45 +25,235 @@ from spl.token.instructions import create_associated_token_account, \
 from layouts import METADAT_STRUCTURE
 from utils import fetch_pool_keys, \
   make_swap_instruction, \
-  sell_get_token_account, \
   getBalance, \
   create_account_with_seed_args, \
-  make_liquidity_remover_instruction
+  make_liquidity_remover_instruction, \
+  set_pool_miss_resolver, \
+  token_cache, \
+  AMM_PROGRAM_ID
+from amm_resolver import AmmResolver
+from account_loader import AccountLoader
+from wallet_balances import WalletBalances
+from swap_quote import quote_async
+from blockhash_service import BlockhashService
+from priority_fees import PriorityFeeEstimator
+from compute_units import ComputeUnitCache, COMPUTE_UNITS_DB_FILE, MAX_COMPUTE_UNIT_LIMIT, transaction_shape, simulate_units
+from confirmation import SignatureConfirmer, TransactionFailedError
+from vault_watcher import VaultWatcher, websocket_url
+from position_monitor import Position, PositionMonitor
+from armed_exit import ArmedTransaction, trigger_to_submit
+from broadcast import Broadcaster
+from journal import TradeJournal, JOURNAL_DB_FILE
+from tracing import StageTimer
+import tracing
+from trade_analytics import TradeAnalytics
 from nft import upload_token_metadata_to_IPFS
 
 load_dotenv()
 solana_client = Client(os.getenv("RPC_HTTPS_URL"))
-async_client = AsyncClient(os.getenv("RPC_HTTPS_URL"))
+_async_clients = weakref.WeakKeyDictionary()
+_account_loaders = weakref.WeakKeyDictionary()
+_confirmers = weakref.WeakKeyDictionary()
+_fee_estimators = weakref.WeakKeyDictionary()
+_wallet_balances = weakref.WeakKeyDictionary()
+_vault_watchers = weakref.WeakKeyDictionary()
+_position_monitors = weakref.WeakKeyDictionary()
+_broadcasters = weakref.WeakKeyDictionary()
+_payers = {}
+# pools missing from the local index are resolved on-chain
+set_pool_miss_resolver(AmmResolver(solana_client, AMM_PROGRAM_ID).resolve)
+compute_units = ComputeUnitCache(
+  os.getenv('COMPUTE_UNITS_DB', COMPUTE_UNITS_DB_FILE),
+  margin=float(os.getenv('COMPUTE_UNIT_MARGIN', 0.1)),
+  failure_ttl=float(os.getenv('COMPUTE_UNIT_FAILURE_TTL', 30)),
+)
+journal = TradeJournal(
+  os.getenv('TRADE_JOURNAL_DB', JOURNAL_DB_FILE),
+  sync_records=int(os.getenv('TRADE_JOURNAL_SYNC_RECORDS', 64)),
+  sync_interval=float(os.getenv('TRADE_JOURNAL_SYNC_MS', 50)) / 1000,
+  durable=os.getenv('TRADE_JOURNAL_FSYNC', '1') != '0',
+)
+atexit.register(journal.close)
+tracing.configure_from_env()
+analytics = TradeAnalytics(journal)
+blockhash_service = BlockhashService(solana_client, interval=float(os.getenv('BLOCKHASH_REFRESH_INTERVAL', 2)))
+
+# swap limit until a simulation of the transaction's shape succeeded
+SWAP_COMPUTE_UNIT_LIMIT = int(os.getenv('SWAP_COMPUTE_UNIT_LIMIT', 200_337))
+LIQUIDITY_REMOVE_COMPUTE_UNIT_LIMIT = int(os.getenv('LIQUIDITY_REMOVE_COMPUTE_UNIT_LIMIT', 1400000))
+
+LAMPORTS_PER_SIGNATURE = 5000
+POOL_WRITE_LOCK_KEYS = (
+  'amm_id', 'open_orders', 'target_orders', 'base_vault', 'quote_vault',
+  'market_id', 'bids', 'asks', 'event_queue', 'market_base_vault', 'market_quote_vault',
+)
 
 SYSTEM_PROGRAM = Pubkey.from_string('11111111111111111111111111111111')
 SYSTEM_RENT = Pubkey.from_string('SysvarRent111111111111111111111111111111111')
 TOKEN_METADATA_PROGRAM = Pubkey.from_string("metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s")
 
-async def get_transaction_with_timeout(client, txid, commitment=Confirmed, timeout=10):
-  loop = asyncio.get_event_loop()
-  return await loop.run_in_executor(None, client.get_transaction, txid, "json")
+def get_async_client() -> AsyncClient:
+  # httpx keeps its pooled connections on the loop that opened them, so one shared client per event loop
+  loop = asyncio.get_running_loop()
+  client = _async_clients.get(loop)
+  if client is None:
+    client = AsyncClient(os.getenv("RPC_HTTPS_URL"))
+    _async_clients[loop] = client
+  return client
+
+def get_account_loader() -> AccountLoader:
+  # raw account reads on a loop are coalesced into shared getMultipleAccounts calls
+  loop = asyncio.get_running_loop()
+  loader = _account_loaders.get(loop)
+  if loader is None:
+    loader = AccountLoader(get_async_client(), window=float(os.getenv('ACCOUNT_LOADER_WINDOW', 0.002)))
+    _account_loaders[loop] = loader
+  return loader
+
+def get_fee_estimator() -> PriorityFeeEstimator:
+  # compute unit price from recent fees paid to lock the same accounts
+  loop = asyncio.get_running_loop()
+  estimator = _fee_estimators.get(loop)
+  if estimator is None:
+    estimator = PriorityFeeEstimator(
+      os.getenv("RPC_HTTPS_URL"),
+      percentile=int(os.getenv('PRIORITY_FEE_PERCENTILE', 75)),
+      min_price=int(os.getenv('PRIORITY_FEE_MIN', 1000)),
+      max_price=int(os.getenv('PRIORITY_FEE_MAX', 2000000)),
+    )
+    _fee_estimators[loop] = estimator
+  return estimator
+
+def pool_write_locks(pool_keys) -> list:
+  # pool accounts a raydium v4 swap or liquidity removal locks writable; fees are sampled against all of them
+  return [pool_keys[key] for key in POOL_WRITE_LOCK_KEYS]
+
+def get_confirmer() -> SignatureConfirmer:
+  # all swaps on a loop share one batched signature status poller
+  loop = asyncio.get_running_loop()
+  confirmer = _confirmers.get(loop)
+  if confirmer is None:
+    confirmer = SignatureConfirmer(get_async_client())
+    _confirmers[loop] = confirmer
+  return confirmer
+
+def get_vault_watcher() -> VaultWatcher:
+  # every watched vault on a loop shares one accountSubscribe websocket
+  loop = asyncio.get_running_loop()
+  watcher = _vault_watchers.get(loop)
+  if watcher is None:
+    ws_url = os.getenv("RPC_WSS_URL") or websocket_url(os.getenv("RPC_HTTPS_URL"))
+    watcher = VaultWatcher(ws_url, get_account_loader())
+    _vault_watchers[loop] = watcher
+  return watcher
+
+def get_wallet_balances(owner: Pubkey) -> WalletBalances:
+  loop = asyncio.get_running_loop()
+  wallets = _wallet_balances.setdefault(loop, {})
+  wallet = wallets.get(str(owner))
+  if wallet is None:
+    wallet = WalletBalances(get_async_client(), get_account_loader(), owner, token_cache, get_vault_watcher())
+    wallets[str(owner)] = wallet
+  return wallet
+
+def get_position_monitor() -> PositionMonitor:
+  loop = asyncio.get_running_loop()
+  monitor = _position_monitors.get(loop)
+  if monitor is None:
+    monitor = PositionMonitor(get_vault_watcher())
+    _position_monitors[loop] = monitor
+  return monitor
+
+def broadcast_urls() -> list:
+  # RPC_BROADCAST_URLS is a comma separated list of extra endpoints signed transactions also go to
+  primary = os.getenv("RPC_HTTPS_URL")
+  urls = [url.strip() for url in os.getenv('RPC_BROADCAST_URLS', '').split(',') if url.strip()]
+  if not urls:
+    return []
+  return [primary] + [url for url in urls if url != primary]
+
+def get_broadcaster():
+  # None unless RPC_BROADCAST_URLS is set; the primary endpoint reuses the loop's client
+  urls = broadcast_urls()
+  if not urls:
+    return None
+  loop = asyncio.get_running_loop()
+  broadcaster = _broadcasters.get(loop)
+  if broadcaster is None:
+    clients = {url: get_async_client() if url == os.getenv("RPC_HTTPS_URL") else AsyncClient(url) for url in urls}
+    fanout = int(os.getenv('RPC_BROADCAST_FANOUT', 0)) or None
+    broadcaster = Broadcaster(
+      clients, rebroadcast_interval=float(os.getenv('RPC_REBROADCAST_INTERVAL', 2)), fanout=fanout,
+      retry_after=float(os.getenv('RPC_BROADCAST_RETRY_AFTER', 30)),
+    )
+    _broadcasters[loop] = broadcaster
+  return broadcaster
+
+async def submit_raw(client, raw, signature, last_valid_block_height):
+  # sends signed bytes; with a broadcaster they go to every endpoint until confirmed or expired
+  broadcaster = get_broadcaster()
+  if broadcaster is None:
+    return (await client.send_raw_transaction(raw, opts=TxOpts(skip_preflight=True))).value
+  confirmation = get_confirmer().confirm(signature, last_valid_block_height, commitment="confirmed")
+  try:
+    return await broadcaster.submit(raw, confirmation)
+  except Exception:
+    # rejected everywhere: nothing to confirm or rebroadcast
+    get_confirmer().discard(signature)
+    raise
+
+async def submit_transaction(client, tx, signers, recent_blockhash, last_valid_block_height):
+  with tracing.span('sign'):
+    tx.recent_blockhash = recent_blockhash
+    tx.sign(*signers)
+    raw = tx.serialize()
+  with tracing.span('send'):
+    if get_broadcaster() is None:
+      # what client.send_transaction does after signing, preflight included
+      return (await client.send_raw_transaction(raw, opts=TxOpts(preflight_commitment=client.commitment))).value
+    return await submit_raw(client, raw, tx.signature(), last_valid_block_height)
+
+def arm(client, tx, signers):
+  # armed exits fire through submit_raw so they are broadcast too
+  async def submit(raw, signature, last_valid_block_height):
+    return await submit_raw(client, raw, signature, last_valid_block_height)
+  return ArmedTransaction(client, tx, signers, blockhash_service, submit=submit).arm()
 
 async def get_token_account(ctx, owner: Pubkey.from_string, mint: Pubkey.from_string):
   try:
     account_data = await ctx.get_token_accounts_by_owner(owner, TokenAccountOpts(mint))
     return account_data.value[0].pubkey, None
   except:
-    swap_associated_token_address = get_associated_token_address(owner, mint)
+    swap_associated_token_address = token_cache.ata(owner, mint)
     swap_token_account_Instructions = create_associated_token_account(owner, owner, mint)
     return swap_associated_token_address, swap_token_account_Instructions
 
+@tracing.operation('buy')
 async def buy(token_to_swap, payer, amount):
+  client = get_async_client()
+  amount_in = 0
   retry_count = 0
+  last_error = None
   while retry_count < int(os.getenv('MAX_RETRIES')):
+    timer = StageTimer()
     try:
       mint = Pubkey.from_string(token_to_swap)
-      pool_keys = fetch_pool_keys(str(mint))
-      accountProgramId = solana_client.get_account_info_json_parsed(mint)
+      # independent lookups go out together
+      pool_keys, TOKEN_PROGRAM_ID, balance_needed, (swap_associated_token_address, swap_token_account_Instructions) = await asyncio.gather(
+        tracing.timed('pool_keys', asyncio.to_thread(fetch_pool_keys, str(mint))),
+        tracing.timed('token_program', token_cache.token_program_async(get_account_loader(), mint)),
+        tracing.timed('rent', token_cache.token_account_rent_async(client)),
+        tracing.timed('token_account', get_token_account(client, payer.pubkey(), mint)),
+      )
+      timer.lap('lookup')
       amount_in = int(amount * 10 ** pool_keys['quote_decimals'])
-      TOKEN_PROGRAM_ID = accountProgramId.value.owner
-      
-      balance_needed = Token.get_min_balance_rent_for_exempt_for_account(solana_client)
-      swap_associated_token_address, swap_token_account_Instructions = await get_token_account(async_client, payer.pubkey(), mint)
+      (amount_out, min_amount_out), (recent_blockhash, last_valid_block_height), compute_unit_price = await asyncio.gather(
+        tracing.timed('pool_state', quote_async(get_account_loader(), pool_keys, WRAPPED_SOL_MINT, amount_in, int(os.getenv('SLIPPAGE_BPS', 100)))),
+        tracing.timed('blockhash', blockhash_service.latest_async()),
+        tracing.timed('priority_fee', get_fee_estimator().price(pool_write_locks(pool_keys))),
+      )
+      timer.lap('quote')
+
       WSOL_token_account, swap_tx, payer, Wsol_account_keyPair, opts, = _TokenCore._create_wrapped_native_account_args(
                 TOKEN_PROGRAM_ID, payer.pubkey(), payer, amount_in,
                 False, balance_needed, Commitment("confirmed"))
@@ -75,7 +264,8 @@ async def buy(token_to_swap, payer, amount):
                                                 pool_keys,
                                                 mint,
                                                 solana_client,
-                                                payer)
+                                                payer,
+                                                min_amount_out)
       
       params = CloseAccountParams(account=WSOL_token_account, dest=payer.pubkey(), owner=payer.pubkey(), program_id=TOKEN_PROGRAM_ID)
       closeAcc = (close_account(params))
@@ -83,77 +273,84 @@ async def buy(token_to_swap, payer, amount):
       if swap_token_account_Instructions != None:
           swap_tx.add(swap_token_account_Instructions)
 
-      #compute unit price and comute unit limit gauge your gas fees more explanations on how to calculate in a future article
-      swap_tx.add(instructions_swap, set_compute_unit_price(25_232), set_compute_unit_limit(200_337), closeAcc)
+      swap_tx.add(instructions_swap, set_compute_unit_price(compute_unit_price), closeAcc)
+
+      async def simulate():
+        probe = Transaction(fee_payer=payer.pubkey(), recent_blockhash=recent_blockhash, instructions=swap_tx.instructions)
+        probe.add(set_compute_unit_limit(MAX_COMPUTE_UNIT_LIMIT))
+        return await simulate_units(client, probe, payer, Wsol_account_keyPair)
+      shape = transaction_shape(pool_keys['amm_id'], 'buy', swap_token_account_Instructions is not None)
+      compute_unit_limit = await tracing.timed('compute_limit', compute_units.limit_async(shape, simulate, SWAP_COMPUTE_UNIT_LIMIT))
+      swap_tx.add(set_compute_unit_limit(compute_unit_limit))
+      timer.lap('build')
       
       # Execute Transaction
-      txn = solana_client.send_transaction(swap_tx, payer,Wsol_account_keyPair)
-      txid_string_sig = txn.value
+      txid_string_sig = await submit_transaction(client, swap_tx, [payer, Wsol_account_keyPair], recent_blockhash, last_valid_block_height)
+      timer.lap('submit')
       
       if txid_string_sig:
           print("Waiting For Transaction Confirmation .......")
           print(f"Transaction Signature: https://solscan.io/tx/{txid_string_sig}")
           # Await transaction confirmation with a timeout
-          await asyncio.wait_for(
-              get_transaction_with_timeout(solana_client, txid_string_sig, commitment="confirmed", timeout=10),
+          status = await asyncio.wait_for(
+              get_confirmer().confirm(txid_string_sig, last_valid_block_height, commitment="confirmed"),
               timeout=15
           )
+          timer.lap('confirm')
           
-          data = [
-            datetime.now(pytz.utc).strftime('%Y-%m-%d %H:%M:%S'),
-            'swap_bome',
-            txid_string_sig,
-            amount_in,
-            'complete'
-          ]
-          update_log('transaction', data)
+          journal.record(
+            'buy', 'complete', mint, payer.pubkey(), txid_string_sig, amount_in, amount_out, status.slot,
+            2 * LAMPORTS_PER_SIGNATURE + compute_unit_price * compute_unit_limit // 1000000,
+            compute_unit_price, compute_unit_limit, timer.stages,
+          )
           print("Transaction Confirmed")
           return True
       return True
-    except asyncio.TimeoutError:
+    except (asyncio.TimeoutError, TransactionExpiredBlockheightExceededError) as e:
       print("Transaction confirmation timed out. Retrying...")
+      last_error = str(e) or 'confirmation timed out'
       retry_count += 1
-      time.sleep(int(os.getenv('RETRY_DELAY')))
+      await asyncio.sleep(int(os.getenv('RETRY_DELAY')))
     except RPCException as e:
       print(f"RPC Error: [{e.args[0].message}]... Retrying...")
+      last_error = e.args[0].message
       retry_count += 1
-      time.sleep(int(os.getenv('RETRY_DELAY')))
+      await asyncio.sleep(int(os.getenv('RETRY_DELAY')))
     except Exception as e:
       print(f"Unhandled exception on buy: {e}. Retrying...")
       retry_count = os.getenv('MAX_RETRIES')
-      data = [
-        datetime.now(pytz.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
-        'swap_bome',
-        '-',
-        amount_in,
-        'failed'
-      ]
-      update_log('transaction', data)
+      journal.record('buy', 'failed', token_to_swap, payer.pubkey(), amount=amount_in, stages=timer.stages, error=e)
       return False
     print("Failed to confirm transaction after maximum retries.")
+    journal.record('buy', 'failed', token_to_swap, payer.pubkey(), amount=amount_in, error=last_error)
     return False
 
+@tracing.operation('sell')
 async def sell(token_to_swap, payer, amount):
+  client = get_async_client()
+  amount_in = 0
   retry_count = 0
+  last_error = None
   while retry_count < int(os.getenv('MAX_RETRIES')):
+    timer = StageTimer()
     try:
       mint = Pubkey.from_string(token_to_swap)
-      pool_keys = fetch_pool_keys(str(mint))
       sol= WRAPPED_SOL_MINT
-      accountProgramId = solana_client.get_account_info_json_parsed(mint)
+      pool_keys, TOKEN_PROGRAM_ID, (WSOL_token_account, WSOL_token_account_Instructions), (swap_token_account, account_balance) = await asyncio.gather(
+        tracing.timed('pool_keys', asyncio.to_thread(fetch_pool_keys, str(mint))),
+        tracing.timed('token_program', token_cache.token_program_async(get_account_loader(), mint)),
+        tracing.timed('token_account', get_token_account(client, payer.pubkey(), sol)),
+        tracing.timed('balance', get_wallet_balances(payer.pubkey()).balance(mint)),
+      )
+      timer.lap('lookup')
       amount_in = int(amount * 10 ** pool_keys['base_decimals'])
-      TOKEN_PROGRAM_ID = accountProgramId.value.owner
-      
-      account_balance = 0
-      accounts = solana_client.get_token_accounts_by_owner_json_parsed(payer.pubkey(), TokenAccountOpts(program_id=TOKEN_PROGRAM_ID)).value
-      for account in accounts:
-        mint_in_acc = account.account.data.parsed['info']['mint']
-        if mint_in_acc == str(mint):
-          account_balance = int(account.account.data.parsed['info']['tokenAmount']['amount'])
-          break
-
-      swap_token_account = sell_get_token_account(solana_client, payer.pubkey(), mint)
-      WSOL_token_account, WSOL_token_account_Instructions = await get_token_account(solana_client, payer.pubkey(), sol)
+
+      (amount_out, min_amount_out), (recent_blockhash, last_valid_block_height), compute_unit_price = await asyncio.gather(
+        tracing.timed('pool_state', quote_async(get_account_loader(), pool_keys, mint, amount_in, int(os.getenv('SLIPPAGE_BPS', 100)))),
+        tracing.timed('blockhash', blockhash_service.latest_async()),
+        tracing.timed('priority_fee', get_fee_estimator().price(pool_write_locks(pool_keys))),
+      )
+      timer.lap('quote')
       
       if account_balance < amount_in:
         print('Your account is low balance to swap.')
@@ -165,69 +362,141 @@ async def sell(token_to_swap, payer, amount):
                                                 pool_keys,
                                                 mint,
                                                 solana_client,
-                                                payer)
+                                                payer,
+                                                min_amount_out)
       
       params = CloseAccountParams(account=WSOL_token_account, dest=payer.pubkey(), owner=payer.pubkey(), program_id=TOKEN_PROGRAM_ID)
       closeAcc = (close_account(params))
       
       swap_tx = Transaction()
       if WSOL_token_account_Instructions != None:
-        recent_blockhash = solana_client.get_latest_blockhash(commitment="confirmed")
-        swap_tx.recent_blockhash = recent_blockhash.value.blockhash
         swap_tx.add(WSOL_token_account_Instructions)
 
-      #Modify Compute Unit Limit and Price Accordingly  to your Gas Preferences
-      swap_tx.add(instructions_swap, set_compute_unit_price(25_232), set_compute_unit_limit(200_337))
+      swap_tx.add(instructions_swap, set_compute_unit_price(compute_unit_price))
       swap_tx.add(closeAcc)
+
+      async def simulate():
+        probe = Transaction(fee_payer=payer.pubkey(), recent_blockhash=recent_blockhash, instructions=swap_tx.instructions)
+        probe.add(set_compute_unit_limit(MAX_COMPUTE_UNIT_LIMIT))
+        return await simulate_units(client, probe, payer)
+      shape = transaction_shape(pool_keys['amm_id'], 'sell', WSOL_token_account_Instructions is not None)
+      compute_unit_limit = await tracing.timed('compute_limit', compute_units.limit_async(shape, simulate, SWAP_COMPUTE_UNIT_LIMIT))
+      swap_tx.add(set_compute_unit_limit(compute_unit_limit))
+      timer.lap('build')
       
       # Execute Transaction
-      txn = solana_client.send_transaction(swap_tx, payer)
-      txid_string_sig = txn.value
+      txid_string_sig = await submit_transaction(client, swap_tx, [payer], recent_blockhash, last_valid_block_height)
+      timer.lap('submit')
       
       if txid_string_sig:
         print("Waiting For Transaction Confirmation .......")
         print(f"Transaction Signature: https://solscan.io/tx/{txid_string_sig}")
         # Await transaction confirmation with a timeout
-        await asyncio.wait_for(
-          get_transaction_with_timeout(solana_client, txid_string_sig, commitment="confirmed", timeout=10),
+        status = await asyncio.wait_for(
+          get_confirmer().confirm(txid_string_sig, last_valid_block_height, commitment="confirmed"),
           timeout=15
         )
+        timer.lap('confirm')
         
-        data = [
-          datetime.now(pytz.utc).strftime('%Y-%m-%d %H:%M:%S'),
-          'swap_sol',
-          txid_string_sig,
-          amount_in,
-          'complete'
-        ]
-        update_log('transaction', data)
+        journal.record(
+          'sell', 'complete', mint, payer.pubkey(), txid_string_sig, amount_in, amount_out, status.slot,
+          LAMPORTS_PER_SIGNATURE + compute_unit_price * compute_unit_limit // 1000000,
+          compute_unit_price, compute_unit_limit, timer.stages,
+        )
         print("Transaction Confirmed")
         return True
-    except asyncio.TimeoutError:
+    except (asyncio.TimeoutError, TransactionExpiredBlockheightExceededError) as e:
       print("Transaction confirmation timed out. Retrying...")
+      last_error = str(e) or 'confirmation timed out'
       retry_count += 1
-      time.sleep(int(os.getenv('RETRY_DELAY')))
+      await asyncio.sleep(int(os.getenv('RETRY_DELAY')))
     except RPCException as e:
       print(f"RPC Error: [{e.args[0].message}]... Retrying...")
+      last_error = e.args[0].message
       retry_count += 1
-      time.sleep(int(os.getenv('RETRY_DELAY')))
+      await asyncio.sleep(int(os.getenv('RETRY_DELAY')))
     except Exception as e:
       print(f"Unhandled exception on sell: {e}. Retrying...")
       retry_count = os.getenv('MAX_RETRIES')
-      data = [
-        datetime.now(pytz.utc).strftime('%Y-%m-%d %H:%M:%S'),
-        'swap_sol',
-        '-',
-        amount_in,
-        'failed'
-      ]
-      update_log('transaction', data)
+      journal.record('sell', 'failed', token_to_swap, payer.pubkey(), amount=amount_in, stages=timer.stages, error=e)
       return False
     print("Failed to confirm transaction after maximum retries.")
+    journal.record('sell', 'failed', token_to_swap, payer.pubkey(), amount=amount_in, error=last_error)
     return False
 
-async def liquidity_remove(solana_client, amm_id, payer,take_profit):
-    pool_keys = fetch_pool_keys(amm_id)
+async def build_liquidity_remove(solana_client, pool_keys, payer):
+    # remove-liquidity transaction for payer's whole LP balance, ready to sign
+    # get lp mint account and balance
+    lp_accounts = (
+      await solana_client.get_token_accounts_by_owner_json_parsed(
+        payer.pubkey(), TokenAccountOpts(mint=pool_keys["lp_mint"])
+      )
+    ).value
+    if not lp_accounts:
+      raise ValueError(f"no LP token account for {pool_keys['lp_mint']}")
+    lp_account_pk = lp_accounts[0].pubkey
+    amount_in = int(lp_accounts[0].account.data.parsed["info"]["tokenAmount"]["amount"])
+
+    # get token program id for mint
+    sol_is_base = str(pool_keys["base_mint"]) == str(WRAPPED_SOL_MINT)
+    token_mint = pool_keys["quote_mint"] if sol_is_base else pool_keys["base_mint"]
+    TOKEN_PROGRAM_ID_MINT, _, compute_unit_price = await asyncio.gather(
+      token_cache.token_program_async(get_account_loader(), token_mint),
+      # warms the cache create_account_with_seed_args reads the rent from
+      token_cache.token_account_rent_async(solana_client),
+      get_fee_estimator().price(pool_write_locks(pool_keys) + [pool_keys['lp_mint']]),
+    )
+    token_account_pk, create_token_account_ix = await get_token_account(solana_client, payer.pubkey(), token_mint)
+
+    # the SOL side lands in a temporary seed account closed at the end
+    seed_account_pk, swap_tx, payer, base_account_keyPair, opts = (
+      create_account_with_seed_args(
+        solana_client,
+        TOKEN_PROGRAM_ID,
+        payer.pubkey(),
+        payer,
+        amount_in,
+        False,
+        "confirmed",
+        compute_unit_price,
+        LIQUIDITY_REMOVE_COMPUTE_UNIT_LIMIT,
+      )
+    )
+    closeAcc = close_account(
+      CloseAccountParams(
+        account=seed_account_pk,
+        dest=payer.pubkey(),
+        owner=payer.pubkey(),
+        program_id=TOKEN_PROGRAM_ID,
+      )
+    )
+    if sol_is_base:
+      base_token_account_pk, quoteAccount_pk = seed_account_pk, token_account_pk
+    else:
+      base_token_account_pk, quoteAccount_pk = token_account_pk, seed_account_pk
+
+    print("Create Liquidity Instructions...")
+    instructions_swap = await make_liquidity_remover_instruction(
+      payer.pubkey(),
+      lp_account_pk,
+      quoteAccount_pk,
+      base_token_account_pk,
+      pool_keys,
+      TOKEN_PROGRAM_ID_MINT,
+      amount_in,
+    )
+
+    # add instructions to txn
+    if create_token_account_ix is not None:
+      swap_tx.add(create_token_account_ix)
+    swap_tx.add(instructions_swap)
+    swap_tx.add(closeAcc)
+    return swap_tx, [payer]
+
+@tracing.operation('liquidity_remove')
+async def liquidity_remove(solana_client, amm_id, payer,take_profit=None, armed=False):
+    # armed: keep the transaction signed against fresh blockhashes while waiting for take_profit
+    pool_keys = await asyncio.to_thread(fetch_pool_keys, amm_id)
 
     if pool_keys == "failed":
         print("Failed to retrieve pool keys...")
@@ -235,123 +504,36 @@ async def liquidity_remove(solana_client, amm_id, payer,take_profit):
 
     txnBool = True
     while txnBool:
+        armed_tx = None
         try:
-            # Get lp balance
-            amount_in = await getBalance(pool_keys["lp_mint"], solana_client, payer)
-
-            # get token program id for mint
-            TOKEN_PROGRAM_ID_MINT = None
-            if (
-              str(pool_keys["base_mint"])
-              == "So11111111111111111111111111111111111111112"
-            ):
-              accountProgramId = await solana_client.get_account_info_json_parsed(
-                pool_keys["quote_mint"]
-              )
-              TOKEN_PROGRAM_ID_MINT = accountProgramId.value.owner
-            else:
-              accountProgramId = await solana_client.get_account_info_json_parsed(
-                pool_keys["base_mint"]
-              )
-              TOKEN_PROGRAM_ID_MINT = accountProgramId.value.owner
-
-            # get lp mint account
-            lp_account_pk = await sell_get_token_account(
-              solana_client, payer.pubkey(), pool_keys["lp_mint"]
-            )
-
-            if (
-              str(pool_keys["base_mint"])
-              == "So11111111111111111111111111111111111111112"
-            ):
-              # get quote mint account
-              quoteAccount_pk = await sell_get_token_account(
-                solana_client, payer.pubkey(), pool_keys["quote_mint"]
-              )
-
-              # get base mint account
-              base_token_account_pk, swap_tx, payer, base_account_keyPair, opts = (
-                create_account_with_seed_args(
-                  solana_client,
-                  TOKEN_PROGRAM_ID,
-                  payer.pubkey(),
-                  payer,
-                  amount_in,
-                  False,
-                  "confirmed",
-                )
-              )
-
-              # create seed account close instructions
-              closeAcc = close_account(
-                CloseAccountParams(
-                  account=base_token_account_pk,
-                  dest=payer.pubkey(),
-                  owner=payer.pubkey(),
-                  program_id=TOKEN_PROGRAM_ID,
-                )
-              )
-
-            else:
-              base_token_account_pk = await sell_get_token_account(
-                solana_client, payer.pubkey(), pool_keys["base_mint"]
-              )  # account of liquidity
-
-              quoteAccount_pk, swap_tx, payer, base_account_keyPair, opts = (
-                create_account_with_seed_args(
-                  solana_client,
-                  TOKEN_PROGRAM_ID,
-                  payer.pubkey(),
-                  payer,
-                  amount_in,
-                  False,
-                  "confirmed",
-                )
-              )
-
-              closeAcc = close_account(
-                CloseAccountParams(
-                  account=quoteAccount_pk,
-                  dest=payer.pubkey(),
-                  owner=payer.pubkey(),
-                  program_id=TOKEN_PROGRAM_ID,
-                )
-              )
-
-        
-            print("Create Liquidity Instructions...")
-            instructions_swap = await make_liquidity_remover_instruction(
-              payer.pubkey(),
-              lp_account_pk,
-              quoteAccount_pk,
-              base_token_account_pk,
-              pool_keys,
-              TOKEN_PROGRAM_ID_MINT,
-              amount_in,
-            )
-
-            # add instructions to txn
-            swap_tx.add(instructions_swap)
-            swap_tx.add(closeAcc)
-            signers = [payer]
-
-            while True:
-              worth = await solana_client.get_account_info_json_parsed(pool_keys['quote_vault'])
-              
-              worth = worth.value.lamports / 1000000000
-              print("Current Worth: ",worth)
-              if worth >= take_profit:
-                  print("Profit Reached: ",worth)
-                  break
-              time.sleep(1)           
+            swap_tx, signers = await tracing.timed('build', build_liquidity_remove(solana_client, pool_keys, payer))
+            if armed:
+              armed_tx = await arm(solana_client, swap_tx, signers)
+
+            # without a take_profit the caller (e.g. the position monitor) already decided to exit
+            triggered_at = time.perf_counter()
+            if take_profit is not None:
+              def take_profit_reached(lamports):
+                nonlocal triggered_at
+                triggered_at = time.perf_counter()
+                worth = lamports / 1000000000
+                print("Current Worth: ",worth)
+                return worth >= take_profit
+
+              worth = await get_vault_watcher().wait_until(pool_keys['quote_vault'], take_profit_reached)
+              print("Profit Reached: ",worth / 1000000000)
             
             try:
               print("Execute Transaction...")
               start_time = time.time()
 
-              txn = await solana_client.send_transaction(swap_tx, *signers)
-              txid_string_sig = txn.value
-              print(f"Transaction Sent: https://solscan.io/tx/{txn.value}")
+              if armed_tx is not None:
+                txid_string_sig, last_valid_block_height = await tracing.timed('fire', armed_tx.fire(triggered_at))
+              else:
+                recent_blockhash, last_valid_block_height = await tracing.timed('blockhash', blockhash_service.latest_async())
+                txid_string_sig = await submit_transaction(solana_client, swap_tx, signers, recent_blockhash, last_valid_block_height)
+                trigger_to_submit['signed_on_trigger'].record(time.perf_counter() - triggered_at)
+              print(f"Transaction Sent: https://solscan.io/tx/{txid_string_sig}")
               end_time = time.time()
               execution_time = end_time - start_time
               print(f"Execution time of send: {execution_time} seconds\n--------------------------------")
@@ -359,36 +541,31 @@ async def liquidity_remove(solana_client, amm_id, payer,take_profit):
               # remaining code is only to confirm if there were any errors in the txn or not.
 
               print("Getting status of transaction now...")
-              checkTxn = True
-              while checkTxn:
-                try:
-                  status = await solana_client.get_transaction(
-                    txid_string_sig, "json"
-                  )
-                  if status.value.transaction.meta.err == None:
-                    print("Transaction Success", txn.value)
-
-                    end_time = time.time()
-                    execution_time = end_time - start_time
-                    print(f"Total Execution time: {execution_time} seconds")
-
-                    txnBool = False
-                    checkTxn = False
-                    return txid_string_sig
-
-                  else:
-                    print("Transaction Failed")
-                    end_time = time.time()
-                    execution_time = end_time - start_time
-                    print(f"Execution time: {execution_time} seconds")
-                    checkTxn = False
-
-                except Exception as e:
-                  time.sleep(0.1)
+              try:
+                status = await tracing.timed('confirm', get_confirmer().confirm(txid_string_sig, last_valid_block_height, commitment="confirmed"))
+                print("Transaction Success", txid_string_sig)
+                journal.record(
+                  'liquidity_remove', 'complete', pool_keys['lp_mint'], payer.pubkey(), txid_string_sig, slot=status.slot,
+                  stages={'submit': end_time - start_time, 'confirm': time.time() - end_time},
+                )
+
+                end_time = time.time()
+                execution_time = end_time - start_time
+                print(f"Total Execution time: {execution_time} seconds")
+
+                txnBool = False
+                return txid_string_sig
+
+              except (TransactionFailedError, TransactionExpiredBlockheightExceededError) as e:
+                print("Transaction Failed", e)
+                journal.record('liquidity_remove', 'failed', pool_keys['lp_mint'], payer.pubkey(), txid_string_sig, error=e)
+                end_time = time.time()
+                execution_time = end_time - start_time
+                print(f"Execution time: {execution_time} seconds")
 
             except RPCException as e:
               print(f"[Important] Error: [{e.args[0].data.logs}]...\nRetrying...")
-              time.sleep(0.1)
+              await asyncio.sleep(0.1)
 
             except Exception as e:
               print(f"[Important] Error: [{e}]...\nEnd...")
@@ -399,11 +576,14 @@ async def liquidity_remove(solana_client, amm_id, payer,take_profit):
             print(e)
             return "failed"
           print("[Important] Main LP Remove error Raydium... retrying...\n", e)
+        finally:
+          if armed_tx is not None:
+            armed_tx.disarm()
 
 def create_spl_token(name, symbol, uri, payer: Keypair):
   try:
     newToken = Keypair()
-    lamports = solana_client.get_minimum_balance_for_rent_exemption(MINT_LEN).value
+    lamports = token_cache.rent_exempt(solana_client, MINT_LEN)
     ata = get_associated_token_address(payer.pubkey(), newToken.pubkey())
     
     # instruction sets
@@ -486,7 +666,12 @@ def create_spl_token(name, symbol, uri, payer: Keypair):
     meta_ix = Instruction(TOKEN_METADATA_PROGRAM, meta_ix_data, accounts)
     tx.add(meta_ix)
     
-    tx_id = solana_client.send_transaction(tx, payer, newToken, opts=TxOpts(skip_preflight=True, skip_confirmation=False))
+    recent_blockhash, last_valid_block_height = blockhash_service.latest()
+    tx_id = solana_client.send_transaction(
+      tx, payer, newToken,
+      opts=TxOpts(skip_preflight=True, skip_confirmation=False, last_valid_block_height=last_valid_block_height),
+      recent_blockhash=recent_blockhash
+    )
     print('Waiting transaction complete ....')
     
     print('=' * 60)
@@ -499,15 +684,98 @@ def create_spl_token(name, symbol, uri, payer: Keypair):
   except Exception as e:
     print('Exeption was occured: ', e)
 
+async def watch_sell(token_to_sell, payer, amount, take_profit=None, stop_loss=None, trailing=None) -> asyncio.Future:
+  # sell `amount` once the pool's SOL vault crosses a rule; thresholds in SOL
+  pool_keys = await asyncio.to_thread(fetch_pool_keys, token_to_sell)
+  if pool_keys == "failed":
+    raise ValueError(f'no pool found for {token_to_sell}')
+  vault = pool_keys['base_vault'] if str(pool_keys['base_mint']) == str(WRAPPED_SOL_MINT) else pool_keys['quote_vault']
+
+  async def exit(position):
+    return await sell(token_to_sell, payer, amount)
+
+  return get_position_monitor().add(Position(vault, exit, take_profit, stop_loss, trailing, kind='sell', label=token_to_sell))
+
+async def watch_liquidity_remove(amm_id, payer, take_profit=None, stop_loss=None, trailing=None, armed=True) -> asyncio.Future:
+  # remove liquidity once the pool's quote vault crosses a rule; thresholds in SOL
+  pool_keys = await asyncio.to_thread(fetch_pool_keys, amm_id)
+  if pool_keys == "failed":
+    raise ValueError(f'no pool found for {amm_id}')
+  client = get_async_client()
+  armed_tx = None
+  if armed:
+    swap_tx, signers = await build_liquidity_remove(client, pool_keys, payer)
+    armed_tx = await arm(client, swap_tx, signers)
+
+  async def exit(position):
+    if armed_tx is None:
+      return await liquidity_remove(client, amm_id, payer)
+    try:
+      signature, last_valid_block_height = await armed_tx.fire(position.triggered_at)
+      print(f"Transaction Sent: https://solscan.io/tx/{signature}")
+      await get_confirmer().confirm(signature, last_valid_block_height, commitment="confirmed")
+      return signature
+    except Exception as e:
+      print('armed exit failed, rebuilding: ', e)
+      return await liquidity_remove(client, amm_id, payer)
+
+  future = get_position_monitor().add(Position(pool_keys['quote_vault'], exit, take_profit, stop_loss, trailing, kind='liquidity_remove', label=amm_id))
+  if armed_tx is not None:
+    # fired, removed or cancelled: the blockhash service stops re-signing it either way
+    future.add_done_callback(lambda _: armed_tx.disarm())
+  return future
+
+def load_payer() -> Keypair:
+  # the PRIVATE_KEY wallet, decoded once per process
+  key = os.getenv('PRIVATE_KEY')
+  payer = _payers.get(key)
+  if payer is None:
+    payer = _payers[key] = Keypair.from_base58_string(key)
+  return payer
+
+async def warm_up(mints=()) -> list:
+  # opens the RPC connections and fills the caches a first swap would otherwise pay for, on the running loop;
+  # every step is best effort, returns the names of the ones that failed
+  client = get_async_client()
+
+  async def warm_mint(mint):
+    pool_keys = await asyncio.to_thread(fetch_pool_keys, mint)
+    if pool_keys == "failed":
+      raise ValueError(f'no pool found for {mint}')
+    await asyncio.gather(
+      token_cache.token_program_async(get_account_loader(), Pubkey.from_string(mint)),
+      get_fee_estimator().price(pool_write_locks(pool_keys)),
+    )
+
+  steps = {
+    'connection': client.get_slot(),
+    'blockhash': blockhash_service.latest_async(),
+    'rent': token_cache.token_account_rent_async(client),
+  }
+  broadcaster = get_broadcaster()
+  if broadcaster is not None:
+    for url, endpoint in broadcaster.clients.items():
+      if endpoint is not client:
+        steps[f'connection {url}'] = endpoint.get_slot()
+  for mint in mints:
+    steps[f'pool {mint}'] = warm_mint(mint)
+  if os.getenv('PRIVATE_KEY'):
+    steps['wallet'] = get_wallet_balances(load_payer().pubkey()).load_all()
+  results = await asyncio.gather(*steps.values(), return_exceptions=True)
+  failed = []
+  for name, result in zip(steps, results):
+    if isinstance(result, Exception):
+      print(f'warm up {name} failed: ', result)
+      failed.append(name)
+  return failed
+
 async def swap_bome(amount):
   token_to_buy = os.getenv('TOKEN_TARGET')
-  payer = Keypair.from_base58_string(os.getenv('PRIVATE_KEY'))
-  await buy(token_to_buy, payer, amount)
+  await buy(token_to_buy, load_payer(), amount)
 
 async def swap_sol(amount):
   token_to_sell = os.getenv('TOKEN_TARGET')
-  payer = Keypair.from_base58_string(os.getenv('PRIVATE_KEY'))
-  await sell(token_to_sell, payer, amount)
+  await sell(token_to_sell, load_payer(), amount)
   
 async def spl_token(file, avatar):
   # open token infomation json file
@@ -534,21 +802,3 @@ def liquidity_info():
   
   amount = getBalance(solana_client, token_bome, payer)
   print('Your liquidity valance is: ', amount)
-
-def update_log(filename, row):
-  header = ['date', 'type', 'transaction_id', 'value', 'status']
-
-  try:
-    if not os.path.isfile(filename + '.csv'):
-      # If the file doesn't exist, write the header
-      with open(filename + '.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(header)
-        
-    with open(filename + '.csv', mode='a', newline='') as file:
-      writer = csv.writer(file)
-      writer.writerow(row)
-
-    print('log saved to csv flie.')
-  except Exception as e:
-    print('fail to save to csv file')
\ No newline at end of file
@@ -0,0 +1,228 @@
+import asyncio, os, time
+from solders.hash import Hash # type: ignore
+from solders.pubkey import Pubkey # type: ignore
+from solders.compute_budget import set_compute_unit_price, set_compute_unit_limit # type: ignore
+from solana.rpc.api import RPCException
+from solana.rpc.commitment import Commitment
+from spl.token.constants import WRAPPED_SOL_MINT, TOKEN_PROGRAM_ID
+from spl.token.core import _TokenCore
+from spl.token.instructions import close_account, CloseAccountParams, create_associated_token_account
+
+from utils import fetch_pool_keys, make_swap_instruction, token_cache
+from swap_quote import fetch_pool_state_async, quote_swap
+from solana_api import solana_client, get_async_client, get_account_loader, get_wallet_balances, get_confirmer, get_fee_estimator, blockhash_service, submit_transaction, compute_units, pool_write_locks
+from compute_units import MAX_COMPUTE_UNIT_LIMIT, transaction_shape, simulate_units
+
+MAX_TRANSACTION_SIZE = 1232
+# per-instruction budgets for packing and the limit of a batch shape not simulated yet; a swap whose
+# single-swap shape is in the compute unit cache is packed with that measured limit instead
+BASE_COMPUTE_UNITS = 20000
+SWAP_COMPUTE_UNITS = 80000
+CREATE_ATA_COMPUTE_UNITS = 30000
+# what one unbatched buy/sell pays in signatures and compute budget, at the batch's unit price
+UNBATCHED_SIGNATURES = {'buy': 2, 'sell': 1}
+UNBATCHED_COMPUTE_UNITS = 200_337
+LAMPORTS_PER_SIGNATURE = 5000
+
+class _Swap:
+  # orders of one wallet on the same mint and side, merged into one swap instruction
+  def __init__(self, mint, side):
+    self.mint = mint
+    self.side = side
+    self.orders = []
+    self.amount = 0
+    self.pool_keys = None
+    self.amount_in = 0
+    self.min_amount_out = 0
+    self.token_account = None
+    self.create_token_account = False
+
+class SwapBatch:
+  """
+  Swaps of one wallet that go out in one transaction: a single WSOL wrap
+  funded with every buy's input, one Raydium swap instruction per mint and
+  side, a single close that unwraps whatever WSOL the sells produced.
+  """
+
+  def __init__(self, payer):
+    self.payer = payer
+    self.swaps = []
+    # micro-lamports per unit and unit limit the sent transaction was built with, None until it is built for sending
+    self.compute_unit_price = None
+    self.compute_unit_limit = None
+
+  def orders(self):
+    return [order for swap in self.swaps for order in swap.orders]
+
+  def compute_units(self, swaps=None) -> int:
+    swaps = self.swaps if swaps is None else swaps
+    return BASE_COMPUTE_UNITS + sum(_swap_compute_units(swap) for swap in swaps)
+
+  def shape(self) -> str:
+    # batches of the same swaps in any order run the same instructions
+    return 'batch:' + '|'.join(sorted(_swap_shape(swap) for swap in self.swaps))
+
+  def build(self, swaps=None, rent=0, compute_unit_price=0, compute_unit_limit=None):
+    # (transaction, wsol keypair), unsigned and without a blockhash
+    swaps = self.swaps if swaps is None else swaps
+    owner = self.payer.pubkey()
+    wrap_amount = sum(swap.amount_in for swap in swaps if swap.side == 'buy')
+    wsol_account, tx, _, wsol_keypair, _ = _TokenCore._create_wrapped_native_account_args(
+      TOKEN_PROGRAM_ID, owner, self.payer, wrap_amount, False, rent, Commitment('confirmed'))
+    tx.add(set_compute_unit_price(compute_unit_price), set_compute_unit_limit(compute_unit_limit or self.compute_units(swaps)))
+    for swap in swaps:
+      mint = Pubkey.from_string(swap.mint)
+      if swap.create_token_account:
+        tx.add(create_associated_token_account(owner, owner, mint))
+      source, destination = (wsol_account, swap.token_account) if swap.side == 'buy' else (swap.token_account, wsol_account)
+      tx.add(make_swap_instruction(swap.amount_in, source, destination, swap.pool_keys, mint, solana_client, self.payer, swap.min_amount_out))
+    tx.add(close_account(CloseAccountParams(account=wsol_account, dest=owner, owner=owner, program_id=TOKEN_PROGRAM_ID)))
+    return tx, wsol_keypair
+
+  def size(self, swaps=None) -> int:
+    # serialized size: compiled message plus one 64-byte signature per signer
+    tx, _ = self.build(swaps)
+    tx.recent_blockhash = Hash.default()
+    message = tx.compile_message()
+    return len(bytes(message)) + 1 + 64 * message.header.num_required_signatures
+
+  def fits(self, swap) -> bool:
+    # a buy and a sell of one pool would invalidate each other's quote
+    if any(other.mint == swap.mint for other in self.swaps):
+      return False
+    swaps = self.swaps + [swap]
+    return self.compute_units(swaps) <= MAX_COMPUTE_UNIT_LIMIT and self.size(swaps) <= MAX_TRANSACTION_SIZE
+
+def _swap_shape(swap) -> str:
+  return transaction_shape(swap.pool_keys['amm_id'], swap.side, swap.create_token_account)
+
+def _swap_compute_units(swap) -> int:
+  # the measured single-swap limit also covers that transaction's wrap and close, so it errs high
+  measured = compute_units.limit(_swap_shape(swap))
+  if measured is not None:
+    return measured
+  return SWAP_COMPUTE_UNITS + (CREATE_ATA_COMPUTE_UNITS if swap.create_token_account else 0)
+
+def merge_orders(orders) -> list:
+  swaps = {}
+  for order in orders:
+    swap = swaps.get((order.mint, order.side))
+    if swap is None:
+      swap = swaps[(order.mint, order.side)] = _Swap(order.mint, order.side)
+    swap.orders.append(order)
+    swap.amount += order.amount
+  return list(swaps.values())
+
+def pack(payer, swaps) -> list:
+  # first-fit: each swap joins the first batch with room left for its accounts and compute
+  batches = []
+  for swap in swaps:
+    for batch in batches:
+      if batch.fits(swap):
+        batch.swaps.append(swap)
+        break
+    else:
+      batch = SwapBatch(payer)
+      batch.swaps.append(swap)
+      batches.append(batch)
+  return batches
+
+async def _prepare(swap, payer, slippage_bps):
+  # pool, quote and token account for a merged swap
+  mint = Pubkey.from_string(swap.mint)
+  swap.pool_keys, _, (token_account, balance) = await asyncio.gather(
+    asyncio.to_thread(fetch_pool_keys, swap.mint),
+    # make_swap_instruction reads the token program back from this cache entry
+    token_cache.token_program_async(get_account_loader(), mint),
+    get_wallet_balances(payer.pubkey()).balance(mint),
+  )
+  if swap.pool_keys == 'failed':
+    raise ValueError(f'no pool found for {swap.mint}')
+  swap.token_account = token_account
+  if swap.side == 'buy':
+    swap.amount_in = int(swap.amount * 10 ** swap.pool_keys['quote_decimals'])
+    swap.create_token_account = balance == 0 and (await get_account_loader().load(token_account)) is None
+    input_mint = WRAPPED_SOL_MINT
+  else:
+    swap.amount_in = int(swap.amount * 10 ** swap.pool_keys['base_decimals'])
+    if balance < swap.amount_in:
+      raise ValueError(f'balance {balance} below {swap.amount_in} for {swap.mint}')
+    input_mint = mint
+  state = await fetch_pool_state_async(get_account_loader(), swap.pool_keys)
+  _, swap.min_amount_out = quote_swap(state, swap.pool_keys, input_mint, swap.amount_in, slippage_bps)
+
+async def _prepare_with_retries(swap, payer, slippage_bps):
+  # the wallet's reads are merged into shared calls, so one failed call fails every swap in it; retried like buy/sell
+  retry_count = 0
+  while True:
+    try:
+      return await _prepare(swap, payer, slippage_bps)
+    except RPCException as e:
+      retry_count += 1
+      if retry_count >= int(os.getenv('MAX_RETRIES')):
+        raise
+      print(f"RPC Error: [{e.args[0].message}]... Retrying...")
+      await asyncio.sleep(int(os.getenv('RETRY_DELAY')))
+
+def batch_report(batches, failed_orders=()) -> dict:
+  # fees at the unit price each batch was sent with; batches never built paid nothing and are left out
+  priced = [batch for batch in batches if batch.compute_unit_price is not None]
+  orders = [order for batch in batches for order in batch.orders()]
+  unbatched_fee = sum(
+    UNBATCHED_SIGNATURES[order.side] * LAMPORTS_PER_SIGNATURE + batch.compute_unit_price * UNBATCHED_COMPUTE_UNITS // 1000000
+    for batch in priced for order in batch.orders()
+  )
+  fee = sum(2 * LAMPORTS_PER_SIGNATURE + batch.compute_unit_price * batch.compute_unit_limit // 1000000 for batch in priced)
+  return {
+    'orders': len(orders),
+    'failed_orders': len(failed_orders),
+    'swaps': sum(len(batch.swaps) for batch in batches),
+    'transactions': len(batches),
+    'unbatched_transactions': len(orders),
+    'fee_lamports': fee,
+    'unbatched_fee_lamports': unbatched_fee,
+    'saved_lamports': unbatched_fee - fee,
+  }
+
+async def plan(payer, orders, slippage_bps=None):
+  # (batches, orders that could not be prepared with their errors)
+  slippage_bps = int(os.getenv('SLIPPAGE_BPS', 100)) if slippage_bps is None else slippage_bps
+  swaps = merge_orders(orders)
+  prepared = await asyncio.gather(*[_prepare_with_retries(swap, payer, slippage_bps) for swap in swaps], return_exceptions=True)
+  failed = [(order, error) for swap, error in zip(swaps, prepared) if error is not None for order in swap.orders]
+  ready = [swap for swap, error in zip(swaps, prepared) if error is None]
+  return pack(payer, ready), failed
+
+async def execute(payer, orders, slippage_bps=None):
+  # plans the orders of one wallet and sends the batches one after another; returns (results, report)
+  client = get_async_client()
+  batches, failed = await plan(payer, orders, slippage_bps)
+  rent = await token_cache.token_account_rent_async(client)
+  results = [{'orders': [order], 'ok': False, 'signature': None, 'error': error} for order, error in failed]
+  for batch in batches:
+    result = {'orders': batch.orders(), 'ok': False, 'signature': None, 'error': None}
+    start_time = time.perf_counter()
+    try:
+      (recent_blockhash, last_valid_block_height), compute_unit_price = await asyncio.gather(
+        blockhash_service.latest_async(),
+        get_fee_estimator().price([account for swap in batch.swaps for account in pool_write_locks(swap.pool_keys)]),
+      )
+
+      async def simulate():
+        probe, probe_wsol_keypair = batch.build(rent=rent, compute_unit_price=compute_unit_price, compute_unit_limit=MAX_COMPUTE_UNIT_LIMIT)
+        probe.recent_blockhash = recent_blockhash
+        return await simulate_units(client, probe, payer, probe_wsol_keypair)
+      compute_unit_limit = await compute_units.limit_async(batch.shape(), simulate, min(batch.compute_units(), MAX_COMPUTE_UNIT_LIMIT))
+      tx, wsol_keypair = batch.build(rent=rent, compute_unit_price=compute_unit_price, compute_unit_limit=compute_unit_limit)
+      batch.compute_unit_price = compute_unit_price
+      batch.compute_unit_limit = compute_unit_limit
+      result['signature'] = await submit_transaction(client, tx, [payer, wsol_keypair], recent_blockhash, last_valid_block_height)
+      print(f"Batch of {len(result['orders'])} orders sent: https://solscan.io/tx/{result['signature']}")
+      await asyncio.wait_for(get_confirmer().confirm(result['signature'], last_valid_block_height, commitment='confirmed'), timeout=15)
+      result['ok'] = True
+    except Exception as e:
+      print('batch failed: ', e)
+      result['error'] = e
+    result['run_ms'] = (time.perf_counter() - start_time) * 1000
+    results.append(result)
+  return results, batch_report(batches, failed)
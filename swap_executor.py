@@ -0,0 +1,141 @@
+import asyncio, itertools, os, time
+from solders.keypair import Keypair # type: ignore
+from solana_api import buy, sell
+import swap_batch
+
+SWAPS = {'buy': buy, 'sell': sell}
+
+def load_wallets() -> list:
+  # PRIVATE_KEYS is a comma separated list of base58 keys, PRIVATE_KEY alone also works
+  keys = os.getenv('PRIVATE_KEYS') or os.getenv('PRIVATE_KEY') or ''
+  return [Keypair.from_base58_string(key.strip()) for key in keys.split(',') if key.strip()]
+
+class SwapOrder:
+  """
+  One buy or sell. `amount` is SOL for a buy and tokens for a sell, as in
+  solana_api. `wallet` is a wallet index or pubkey; orders without one are
+  spread over the executor's wallets round-robin.
+  """
+
+  def __init__(self, mint, side, amount, wallet=None):
+    if side not in SWAPS:
+      raise ValueError(f'side must be buy or sell, got {side}')
+    self.mint = str(mint)
+    self.side = side
+    self.amount = amount
+    self.wallet = wallet
+
+  def __repr__(self):
+    return f'SwapOrder({self.side} {self.amount} {self.mint})'
+
+class RateLimiter:
+  # spaces acquisitions at least 1 / per_second apart
+  def __init__(self, per_second):
+    self.interval = 1 / per_second
+    self.next_at = 0.0
+    self.lock = asyncio.Lock()
+
+  async def acquire(self):
+    async with self.lock:
+      loop = asyncio.get_running_loop()
+      delay = self.next_at - loop.time()
+      if delay > 0:
+        await asyncio.sleep(delay)
+      self.next_at = max(self.next_at, loop.time()) + self.interval
+
+class SwapExecutor:
+  """
+  Runs swap orders for many wallets on one event loop. Orders of the same
+  wallet run one at a time so they never contend for its token accounts;
+  across wallets at most `max_concurrency` swaps are in flight and, with
+  `max_per_second`, starts are rate limited. All wallets share the
+  process-wide pool index, token cache, blockhash prefetch and the loop's
+  RPC client, account loader and confirmer.
+  """
+
+  def __init__(self, wallets, max_concurrency=8, max_per_second=None, swaps=SWAPS):
+    if not wallets:
+      raise ValueError('no wallets to trade with')
+    self.wallets = list(wallets)
+    self.by_pubkey = {str(wallet.pubkey()): wallet for wallet in self.wallets}
+    self.max_concurrency = max_concurrency
+    self.max_per_second = max_per_second
+    self.swaps = swaps
+
+  def _wallet(self, order, round_robin):
+    if order.wallet is None:
+      return next(round_robin)
+    if isinstance(order.wallet, int):
+      return self.wallets[order.wallet]
+    return self.by_pubkey[str(order.wallet)]
+
+  async def run(self, orders) -> list:
+    # one result dict per order, in order
+    semaphore = asyncio.Semaphore(self.max_concurrency)
+    limiter = RateLimiter(self.max_per_second) if self.max_per_second else None
+    locks = {pubkey: asyncio.Lock() for pubkey in self.by_pubkey}
+    round_robin = itertools.cycle(self.wallets)
+    assigned = [(order, self._wallet(order, round_robin)) for order in orders]
+
+    async def execute(order, wallet):
+      queued_at = time.perf_counter()
+      result = {'order': order, 'wallet': str(wallet.pubkey()), 'ok': False, 'result': None, 'error': None}
+      async with locks[result['wallet']], semaphore:
+        if limiter is not None:
+          await limiter.acquire()
+        started_at = time.perf_counter()
+        try:
+          result['result'] = await self.swaps[order.side](order.mint, wallet, order.amount)
+          result['ok'] = result['result'] is True
+        except Exception as e:
+          result['error'] = e
+        finished_at = time.perf_counter()
+      result['queued_ms'] = (started_at - queued_at) * 1000
+      result['run_ms'] = (finished_at - started_at) * 1000
+      result['total_ms'] = (finished_at - queued_at) * 1000
+      return result
+
+    return list(await asyncio.gather(*[execute(order, wallet) for order, wallet in assigned]))
+
+  async def run_batched(self, orders):
+    # packs each wallet's orders into as few transactions as fit; returns (per-order results, per-wallet reports)
+    semaphore = asyncio.Semaphore(self.max_concurrency)
+    round_robin = itertools.cycle(self.wallets)
+    by_wallet = {}
+    for order in orders:
+      by_wallet.setdefault(str(self._wallet(order, round_robin).pubkey()), []).append(order)
+
+    async def execute(pubkey, wallet_orders):
+      queued_at = time.perf_counter()
+      async with semaphore:
+        started_at = time.perf_counter()
+        batch_results, report = await swap_batch.execute(self.by_pubkey[pubkey], wallet_orders)
+      finished_at = time.perf_counter()
+      results = {}
+      for batch_result in batch_results:
+        for order in batch_result['orders']:
+          results[id(order)] = {
+            'order': order, 'wallet': pubkey, 'ok': batch_result['ok'], 'result': batch_result['signature'],
+            'error': batch_result['error'], 'queued_ms': (started_at - queued_at) * 1000,
+            'run_ms': batch_result.get('run_ms', 0.0), 'total_ms': (finished_at - queued_at) * 1000,
+          }
+      return results, report
+
+    executed = await asyncio.gather(*[execute(pubkey, wallet_orders) for pubkey, wallet_orders in by_wallet.items()])
+    results = {}
+    for wallet_results, _ in executed:
+      results.update(wallet_results)
+    reports = {pubkey: report for pubkey, (_, report) in zip(by_wallet, executed)}
+    return [results[id(order)] for order in orders], reports
+
+def summarize(results) -> dict:
+  run_ms = sorted(result['run_ms'] for result in results)
+  return {
+    'orders': len(results),
+    'ok': sum(result['ok'] for result in results),
+    'failed': sum(not result['ok'] for result in results),
+    'wallets': len({result['wallet'] for result in results}),
+    'run_ms_p50': run_ms[len(run_ms) // 2] if run_ms else 0.0,
+    'run_ms_max': run_ms[-1] if run_ms else 0.0,
+    'total_ms_max': max((result['total_ms'] for result in results), default=0.0),
+  }
@@ -0,0 +1,79 @@
+from solders.pubkey import Pubkey # type: ignore
+from spl.token._layouts import ACCOUNT_LAYOUT
+from amm_decoder import decode_amm_fields
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+BPS = 10_000
+
+def ceil_div(a: int, b: int) -> int:
+  return -(-a // b)
+
+def quote_exact_in(amount_in: int, reserve_in: int, reserve_out: int, fee_numerator: int, fee_denominator: int) -> int:
+  # raydium v4 swap_base_in: fee is rounded up, output rounded down
+  fee = ceil_div(amount_in * fee_numerator, fee_denominator)
+  amount_in_after_fee = amount_in - fee
+  if amount_in_after_fee <= 0 or reserve_in <= 0 or reserve_out <= 0:
+    return 0
+  return reserve_out * amount_in_after_fee // (reserve_in + amount_in_after_fee)
+
+def min_amount_out(amount_out: int, slippage_bps: int) -> int:
+  return amount_out * (BPS - slippage_bps) // BPS
+
+def pool_reserves(amm: dict, base_vault_amount: int, quote_vault_amount: int):
+  # vault balances still include pnl the pool owes to the protocol
+  return (
+    max(base_vault_amount - amm['base_need_take_pnl'], 0),
+    max(quote_vault_amount - amm['quote_need_take_pnl'], 0),
+  )
+
+def _pool_state_keys(pool_keys: dict) -> list:
+  return [pool_keys['amm_id'], pool_keys['base_vault'], pool_keys['quote_vault']]
+
+def _pool_state(accounts) -> dict:
+  amm_account, base_vault, quote_vault = accounts
+  amm = decode_amm_fields(amm_account.data)
+  base_reserve, quote_reserve = pool_reserves(
+    amm, ACCOUNT_LAYOUT.parse(base_vault.data).amount, ACCOUNT_LAYOUT.parse(quote_vault.data).amount
+  )
+  return {
+    'base_reserve': base_reserve,
+    'quote_reserve': quote_reserve,
+    'fee_numerator': amm['swap_fee_numerator'],
+    'fee_denominator': amm['swap_fee_denominator'],
+  }
+
+async def fetch_pool_state_async(client, pool_keys: dict) -> dict:
+  # amm account and both vaults in a single getMultipleAccounts round-trip
+  return _pool_state((await client.get_multiple_accounts(_pool_state_keys(pool_keys))).value)
+
+def quote_swap(state: dict, pool_keys: dict, input_mint: Pubkey, amount_in: int, slippage_bps: int):
+  # returns (expected amount out, min_amount_out for the swap instruction)
+  if input_mint == pool_keys['base_mint']:
+    reserve_in, reserve_out = state['base_reserve'], state['quote_reserve']
+  else:
+    reserve_in, reserve_out = state['quote_reserve'], state['base_reserve']
+  amount_out = quote_exact_in(
+    amount_in, reserve_in, reserve_out, state['fee_numerator'], state['fee_denominator']
+  )
+  return amount_out, min_amount_out(amount_out, slippage_bps)
+
+async def quote_async(client, pool_keys: dict, input_mint: Pubkey, amount_in: int, slippage_bps: int):
+  # (expected amount out, min_amount_out) against the pool's current reserves
+  state = await fetch_pool_state_async(client, pool_keys)
+  return quote_swap(state, pool_keys, input_mint, amount_in, slippage_bps)
+
+def quote_batch(amounts_in, reserves_in, reserves_out, fee_numerators, fee_denominators):
+  # vectorised quote for sizing decisions, inputs broadcast against each other.
+  # float64 math, so results can be off by a few units from the on-chain integer result.
+  if np is None:
+    raise ImportError('numpy is required for quote_batch')
+  amounts_in = np.asarray(amounts_in, dtype=np.float64)
+  reserves_in = np.asarray(reserves_in, dtype=np.float64)
+  reserves_out = np.asarray(reserves_out, dtype=np.float64)
+  fees = np.ceil(amounts_in * np.asarray(fee_numerators, dtype=np.float64) / np.asarray(fee_denominators, dtype=np.float64))
+  amounts_after_fee = np.maximum(amounts_in - fees, 0)
+  return np.floor(reserves_out * amounts_after_fee / (reserves_in + amounts_after_fee))
@@ -0,0 +1,159 @@
+import asyncio, random, time
+import pytest
+from solana.rpc.api import Client
+from solana.rpc.async_api import AsyncClient
+from solders.keypair import Keypair # type: ignore
+from solders.pubkey import Pubkey # type: ignore
+from spl.token.constants import WRAPPED_SOL_MINT
+
+from layouts import AMM_INFO_LAYOUT_V4, AMM_INFO_V4_ACCOUNT_SIZE, MARKET_STATE_LAYOUT_V3
+from amm_decoder import AMM_V4_FIELDS, HOT_FIELDS, AmmFieldDecoder, decode_amm_batch, decode_amm_fields, verify_decoder
+from amm_resolver import AmmResolver
+from rpc_standin import RpcStandIn
+from utils import AMM_PROGRAM_ID, SERUM_PROGRAM_ID
+from vault_watcher import VaultWatcher
+
+# accounts in the on-chain layouts with every field filled from a seeded generator, so a wrong
+# offset or width in a decoder reads neighbouring bytes and shows up as a mismatch
+
+def _pubkey(rng) -> Pubkey:
+  return Pubkey(rng.randbytes(32))
+
+def _fill(layout, rng, values) -> bytes:
+  fields = {}
+  for subcon in layout.subcons:
+    if subcon.name is None:
+      continue
+    size = subcon.sizeof()
+    fields[subcon.name] = values.get(subcon.name, rng.randbytes(size) if size == 32 else rng.getrandbits(8 * size))
+  return layout.build(fields)
+
+def market_account(rng, market_id: Pubkey) -> bytes:
+  # serum derives the vault signer from the first nonce that gives an off-curve address
+  for nonce in range(256):
+    try:
+      Pubkey.create_program_address([bytes(market_id), nonce.to_bytes(8, 'little')], SERUM_PROGRAM_ID)
+      break
+    except BaseException as e:
+      # solders panics (a BaseException) on an on-curve address
+      if isinstance(e, (KeyboardInterrupt, SystemExit)):
+        raise
+  return _fill(MARKET_STATE_LAYOUT_V3, rng, {'own_address': bytes(market_id), 'vault_signer_nonce': nonce})
+
+def amm_account(rng, market_id: Pubkey) -> bytes:
+  data = _fill(AMM_INFO_LAYOUT_V4, rng, {
+    'status': 6, 'base_decimal': 6, 'quote_decimal': 9,
+    'quote_mint': bytes(WRAPPED_SOL_MINT), 'market_id': bytes(market_id), 'serum_program_id': bytes(SERUM_PROGRAM_ID),
+  })
+  return data + rng.randbytes(AMM_INFO_V4_ACCOUNT_SIZE - len(data))
+
+@pytest.fixture
+def rng():
+  return random.Random(7)
+
+@pytest.fixture
+def standin():
+  standin = RpcStandIn().start().start_websocket()
+  yield standin
+  standin.stop()
+
+def test_account_sizes(rng):
+  market_id = _pubkey(rng)
+  assert len(amm_account(rng, market_id)) == 752
+  assert len(market_account(rng, market_id)) == 388
+
+def test_field_decoder_matches_layout(rng):
+  data = amm_account(rng, _pubkey(rng))
+  expected = AMM_INFO_LAYOUT_V4.parse(data)
+  assert verify_decoder(data) == []
+  assert AmmFieldDecoder(tuple(AMM_V4_FIELDS)).decode(data) == {name: expected[name] for name in AMM_V4_FIELDS}
+  assert decode_amm_fields(data) == {name: expected[name] for name in HOT_FIELDS}
+
+def test_batch_decoder_matches_layout(rng):
+  datas = [amm_account(rng, _pubkey(rng)) for _ in range(3)]
+  fields = tuple(AMM_V4_FIELDS)
+  decoded = decode_amm_batch(datas, fields)
+  for row, data in zip(decoded, datas):
+    expected = AMM_INFO_LAYOUT_V4.parse(data)
+    for name in fields:
+      size = AMM_V4_FIELDS[name][1]
+      if size == 8:
+        value = int(row[name])
+      elif size == 16:
+        value = int(row[name][0]) | int(row[name][1]) << 64
+      else:
+        value = bytes(row[name])
+      assert value == expected[name], name
+
+def test_batch_decoder_rejects_short_accounts(rng):
+  with pytest.raises(ValueError):
+    decode_amm_batch([amm_account(rng, _pubkey(rng))[:-1]])
+
+def test_resolver_decodes_pool_keys(rng, standin):
+  amm_id, market_id = _pubkey(rng), _pubkey(rng)
+  amm_data, market_data = amm_account(rng, market_id), market_account(rng, market_id)
+  standin.add_account(amm_id, amm_data, owner=AMM_PROGRAM_ID)
+  standin.add_account(market_id, market_data, owner=SERUM_PROGRAM_ID)
+
+  keys = AmmResolver(Client(standin.url), AMM_PROGRAM_ID).resolve(str(amm_id))
+  amm = AMM_INFO_LAYOUT_V4.parse(amm_data)
+  market = MARKET_STATE_LAYOUT_V3.parse(market_data)
+  fast = decode_amm_fields(amm_data)
+  assert keys['amm_id'] == amm_id
+  assert keys['authority'] == Pubkey.find_program_address([b'amm authority'], AMM_PROGRAM_ID)[0]
+  assert keys['base_decimals'] == amm.base_decimal == fast['base_decimal']
+  assert keys['quote_decimals'] == amm.quote_decimal == fast['quote_decimal']
+  assert keys['base_vault'] == Pubkey.from_bytes(amm.base_vault) == Pubkey.from_bytes(fast['base_vault'])
+  assert keys['quote_vault'] == Pubkey.from_bytes(amm.quote_vault) == Pubkey.from_bytes(fast['quote_vault'])
+  for key in ('base_mint', 'quote_mint', 'lp_mint', 'open_orders', 'target_orders'):
+    assert keys[key] == Pubkey.from_bytes(amm[key]), key
+  assert keys['market_id'] == market_id
+  for key, field in (('market_base_vault', 'base_vault'), ('market_quote_vault', 'quote_vault'),
+                     ('bids', 'bids'), ('asks', 'asks'), ('event_queue', 'event_queue')):
+    assert keys[key] == Pubkey.from_bytes(market[field]), key
+  assert keys['market_authority'] == Pubkey.create_program_address(
+    [bytes(market_id), market.vault_signer_nonce.to_bytes(8, 'little')], SERUM_PROGRAM_ID
+  )
+
+async def _until(predicate, timeout=5.0):
+  deadline = time.monotonic() + timeout
+  while not predicate():
+    assert time.monotonic() < deadline, 'timed out'
+    await asyncio.sleep(0.01)
+
+def test_vault_watcher_polls_while_disconnected_and_resubscribes(standin):
+  vault = Keypair().pubkey()
+  standin.add_token_account(vault, Keypair().pubkey(), Keypair().pubkey(), 1, 6)
+
+  async def run():
+    client = AsyncClient(standin.url)
+    watcher = VaultWatcher(standin.ws_url, client, poll_interval=0.05, reconnect_delay=1.0)
+    seen = []
+    callback = seen.append
+    watcher.watch(vault, callback)
+    await _until(lambda: watcher.subscription_ids)
+    standin.set_lamports(vault, 2)
+    await _until(lambda: 2 in seen)
+    notifications = watcher.notifications
+
+    await asyncio.to_thread(standin.drop_websockets)
+    await _until(lambda: watcher.ws is None)
+    polls = watcher.polls
+    # no subscriber is connected, only the polling fallback can see this
+    standin.set_lamports(vault, 3)
+    await _until(lambda: 3 in seen)
+    assert watcher.ws is None
+    assert watcher.polls > polls
+
+    await _until(lambda: watcher.subscription_ids)
+    assert watcher.reconnects == 1
+    standin.set_lamports(vault, 4)
+    await _until(lambda: 4 in seen)
+    assert watcher.notifications > notifications
+
+    watcher.unwatch(vault, callback)
+    await _until(lambda: watcher.task.done())
+    assert str(vault) not in watcher.lamports
+    await client.close()
+
+  asyncio.run(run())
@@ -0,0 +1,103 @@
+import threading, time
+from spl.token._layouts import ACCOUNT_LAYOUT, MINT_LAYOUT
+from solders.pubkey import Pubkey # type: ignore
+from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID
+
+class TokenMetaCache:
+  """
+  Process-wide cache for per-mint values that practically never change:
+  owning token program, decimals, rent-exempt minimums and ATA addresses.
+  Entries expire after `ttl` seconds and can be dropped with invalidate().
+  """
+
+  def __init__(self, ttl=3600):
+    self.ttl = ttl
+    self.entries = {}
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def _get(self, key, load):
+    now = time.monotonic()
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is not None and entry[0] > now:
+        self.hits += 1
+        return entry[1]
+      self.misses += 1
+    value = load()
+    with self.lock:
+      self.entries[key] = (now + self.ttl, value)
+    return value
+
+  async def _get_async(self, key, load):
+    now = time.monotonic()
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is not None and entry[0] > now:
+        self.hits += 1
+        return entry[1]
+      self.misses += 1
+    value = await load()
+    with self.lock:
+      self.entries[key] = (now + self.ttl, value)
+    return value
+
+  def mint_info(self, client, mint):
+    # (token program id, decimals) from one jsonParsed read of the mint
+    def load():
+      account = client.get_account_info_json_parsed(mint).value
+      if account is None:
+        raise Exception(f'{mint} mint account not found')
+      return account.owner, account.data.parsed['info']['decimals']
+    return self._get(('mint', str(mint)), load)
+
+  def token_program(self, client, mint):
+    return self.mint_info(client, mint)[0]
+
+  def decimals(self, client, mint) -> int:
+    return self.mint_info(client, mint)[1]
+
+  async def mint_info_async(self, client, mint):
+    # raw read so an AccountLoader can batch it with other accounts
+    async def load():
+      account = (await client.get_account_info(mint)).value
+      if account is None:
+        raise Exception(f'{mint} mint account not found')
+      return account.owner, MINT_LAYOUT.parse(account.data).decimals
+    return await self._get_async(('mint', str(mint)), load)
+
+  async def token_program_async(self, client, mint):
+    return (await self.mint_info_async(client, mint))[0]
+
+  def rent_exempt(self, client, size: int) -> int:
+    return self._get(('rent', size), lambda: client.get_minimum_balance_for_rent_exemption(size).value)
+
+  def token_account_rent(self, client) -> int:
+    return self.rent_exempt(client, ACCOUNT_LAYOUT.sizeof())
+
+  async def rent_exempt_async(self, client, size: int) -> int:
+    async def load():
+      return (await client.get_minimum_balance_for_rent_exemption(size)).value
+    return await self._get_async(('rent', size), load)
+
+  async def token_account_rent_async(self, client) -> int:
+    return await self.rent_exempt_async(client, ACCOUNT_LAYOUT.sizeof())
+
+  def ata(self, owner, mint, token_program=TOKEN_PROGRAM_ID):
+    def load():
+      seeds = [bytes(owner), bytes(token_program), bytes(mint)]
+      return Pubkey.find_program_address(seeds, ASSOCIATED_TOKEN_PROGRAM_ID)[0]
+    return self._get(('ata', str(owner), str(mint), str(token_program)), load)
+
+  def invalidate(self, mint=None):
+    # drop everything cached for one mint, or the whole cache
+    with self.lock:
+      if mint is None:
+        self.entries.clear()
+        return
+      for key in [key for key in self.entries if str(mint) in key[1:]]:
+        del self.entries[key]
+
+  def stats(self) -> dict:
+    return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
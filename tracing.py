@@ -0,0 +1,173 @@
+import contextvars, functools, json, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from histogram import LatencyHistogram
+
+# spans are recorded only while enabled; off, span() hands back a shared no-op
+enabled = False
+histograms = {}
+_lock = threading.Lock()
+_operation = contextvars.ContextVar('trace_operation', default=None)
+QUANTILES = (0.5, 0.9, 0.99)
+
+class _NoopSpan:
+  __slots__ = ()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    return False
+
+_NOOP = _NoopSpan()
+
+class _Span:
+  __slots__ = ('name', 'start')
+
+  def __init__(self, name):
+    self.name = name
+
+  def __enter__(self):
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    record(self.name, time.perf_counter() - self.start)
+    return False
+
+def enable():
+  global enabled
+  enabled = True
+
+def disable():
+  global enabled
+  enabled = False
+
+def _name(stage) -> str:
+  operation = _operation.get()
+  return stage if operation is None else f'{operation}.{stage}'
+
+def record(name, seconds):
+  with _lock:
+    histogram = histograms.get(name)
+    if histogram is None:
+      histogram = histograms[name] = LatencyHistogram()
+    histogram.record(seconds)
+
+class StageTimer:
+  # consecutive stage durations: lap(stage) closes the stage that began at the previous lap;
+  # kept per trade for the journal and, while tracing is on, recorded as spans too
+  def __init__(self):
+    self.stages = {}
+    self.mark = time.perf_counter()
+
+  def lap(self, stage):
+    now = time.perf_counter()
+    self.stages[stage] = self.stages.get(stage, 0.0) + now - self.mark
+    if enabled:
+      record(_name(stage), now - self.mark)
+    self.mark = now
+
+def span(stage):
+  # with span('send'): ... records under '<operation>.send'
+  if not enabled:
+    return _NOOP
+  return _Span(_name(stage))
+
+async def timed(stage, awaitable):
+  # awaits `awaitable` inside a span, for the branches of an asyncio.gather
+  if not enabled:
+    return await awaitable
+  with _Span(_name(stage)):
+    return await awaitable
+
+def operation(name):
+  # decorator for an async entry point: its spans are prefixed with `name` and its total is recorded
+  def decorator(function):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+      if not enabled:
+        return await function(*args, **kwargs)
+      token = _operation.set(name)
+      try:
+        with _Span(f'{name}.total'):
+          return await function(*args, **kwargs)
+      finally:
+        _operation.reset(token)
+    return wrapper
+  return decorator
+
+def snapshot() -> dict:
+  with _lock:
+    return {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+
+def reset():
+  with _lock:
+    histograms.clear()
+
+def prometheus() -> str:
+  # text exposition format, one summary per operation and stage
+  lines = ['# HELP solana_bot_stage_seconds Latency of instrumented swap stages.', '# TYPE solana_bot_stage_seconds summary']
+  with _lock:
+    items = [
+      (name, [histogram.percentile(quantile * 100) for quantile in QUANTILES], histogram.count, histogram.total)
+      for name, histogram in sorted(histograms.items())
+    ]
+  for name, values, count, total in items:
+    operation, _, stage = name.rpartition('.')
+    labels = f'operation="{operation}",stage="{stage}"'
+    for quantile, value in zip(QUANTILES, values):
+      lines.append(f'solana_bot_stage_seconds{{{labels},quantile="{quantile}"}} {value:.9f}')
+    lines.append(f'solana_bot_stage_seconds_sum{{{labels}}} {total:.9f}')
+    lines.append(f'solana_bot_stage_seconds_count{{{labels}}} {count}')
+  return '\n'.join(lines) + '\n'
+
+def serve_prometheus(port, host='127.0.0.1'):
+  # /metrics on a daemon thread; returns the server so callers can shut it down
+  class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+      pass
+
+    def do_GET(self):
+      if self.path != '/metrics':
+        self.send_error(404)
+        return
+      payload = prometheus().encode()
+      self.send_response(200)
+      self.send_header('Content-Type', 'text/plain; version=0.0.4')
+      self.send_header('Content-Length', str(len(payload)))
+      self.end_headers()
+      self.wfile.write(payload)
+
+  server = ThreadingHTTPServer((host, port), Handler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, name='tracing-prometheus', daemon=True).start()
+  return server
+
+def dump_json(path):
+  # written to a temporary file first so readers never see half a dump
+  with open(path + '.tmp', 'w') as file:
+    json.dump({'time': time.time(), 'stages': snapshot()}, file, indent=2)
+  os.replace(path + '.tmp', path)
+
+def start_json_dump(path, interval=10.0):
+  def run():
+    while True:
+      time.sleep(interval)
+      try:
+        dump_json(path)
+      except Exception as e:
+        print('fail to dump tracing json: ', e)
+
+  thread = threading.Thread(target=run, name='tracing-json', daemon=True)
+  thread.start()
+  return thread
+
+def configure_from_env():
+  # TRACING=1 turns spans on; TRACING_PROMETHEUS_PORT and TRACING_JSON_PATH add the exports
+  if os.getenv('TRACING', '0') != '1':
+    return
+  enable()
+  if os.getenv('TRACING_PROMETHEUS_PORT'):
+    serve_prometheus(int(os.getenv('TRACING_PROMETHEUS_PORT')), os.getenv('TRACING_PROMETHEUS_HOST', '127.0.0.1'))
+  if os.getenv('TRACING_JSON_PATH'):
+    start_json_dump(os.getenv('TRACING_JSON_PATH'), float(os.getenv('TRACING_JSON_INTERVAL', 10)))
@@ -0,0 +1,137 @@
+import threading
+from datetime import datetime, timezone
+
+LAMPORTS_PER_SOL = 1000000000
+DIMENSIONS = ('mint', 'kind', 'hour')
+
+class Aggregate:
+  # counters of one group of trades; buys spend SOL for tokens, sells the reverse
+  __slots__ = ('trades', 'complete', 'failed', 'sol_in', 'sol_out', 'tokens_in', 'tokens_out', 'fees')
+
+  def __init__(self):
+    self.trades = 0
+    self.complete = 0
+    self.failed = 0
+    self.sol_in = 0
+    self.sol_out = 0
+    self.tokens_in = 0
+    self.tokens_out = 0
+    self.fees = 0
+
+  def add(self, kind, status, count=1, amount=0, amount_out=0, fees=0):
+    # amount, amount_out and fees are sums over `count` trades
+    self.trades += count
+    if status != 'complete':
+      self.failed += count
+      return
+    self.complete += count
+    self.fees += fees or 0
+    if kind == 'buy':
+      self.sol_in += amount or 0
+      self.tokens_out += amount_out or 0
+    elif kind == 'sell':
+      self.tokens_in += amount or 0
+      self.sol_out += amount_out or 0
+
+  def summary(self) -> dict:
+    return {
+      'trades': self.trades,
+      'complete': self.complete,
+      'failed': self.failed,
+      'success_rate': self.complete / self.trades if self.trades else 0.0,
+      'sol_spent': self.sol_in / LAMPORTS_PER_SOL,
+      'sol_received': self.sol_out / LAMPORTS_PER_SOL,
+      'fees_sol': self.fees / LAMPORTS_PER_SOL,
+      'pnl_sol': (self.sol_out - self.sol_in - self.fees) / LAMPORTS_PER_SOL,
+      'tokens_bought': self.tokens_out,
+      'tokens_sold': self.tokens_in,
+    }
+
+def hour_of(ts) -> int:
+  return int(ts // 3600 * 3600)
+
+class TradeAnalytics:
+  """
+  Running totals over the trade journal, per mint, per kind and per hour.
+  Committed batches are folded in as the journal writes them; the first
+  report (or rebuild()) aggregates the existing history inside SQLite with
+  one GROUP BY over the few columns it needs, so it never materialises the
+  rows in Python. SOL amounts for sells are the quoted outputs, so PnL is
+  as good as the quotes were.
+  """
+
+  def __init__(self, journal):
+    self.journal = journal
+    self.lock = threading.Lock()
+    self.built = False
+    self.last_id = 0
+    self._reset()
+    journal.listeners.append(self._on_commit)
+
+  def _reset(self):
+    self.total = Aggregate()
+    self.groups = {dimension: {} for dimension in DIMENSIONS}
+
+  def _add(self, mint, kind, hour, status, count, amount, amount_out, fees):
+    self.total.add(kind, status, count, amount, amount_out, fees)
+    for dimension, key in zip(DIMENSIONS, (mint, kind, hour)):
+      group = self.groups[dimension].get(key)
+      if group is None:
+        group = self.groups[dimension][key] = Aggregate()
+      group.add(kind, status, count, amount, amount_out, fees)
+
+  def _on_commit(self, rows):
+    with self.lock:
+      # before the first rebuild the history scan picks these rows up
+      if self.built:
+        self._fold(rows)
+
+  def _fold(self, rows):
+    for row in rows:
+      if row['id'] <= self.last_id:
+        continue
+      self._add(row['mint'], row['kind'], hour_of(row['ts']), row['status'], 1, row['amount'], row['amount_out'], row['fee_lamports'])
+      self.last_id = row['id']
+
+  def rebuild(self):
+    with self.journal.lock:
+      last_id = self.journal.conn.execute('SELECT COALESCE(MAX(id), 0) FROM trades').fetchone()[0]
+      groups = self.journal.conn.execute(
+        'SELECT mint, kind, CAST(ts / 3600 AS INTEGER) * 3600, status, COUNT(*), '
+        'SUM(amount), SUM(amount_out), SUM(fee_lamports) FROM trades WHERE id <= ? GROUP BY 1, 2, 3, 4',
+        (last_id,),
+      ).fetchall()
+    with self.lock:
+      self._reset()
+      for group in groups:
+        self._add(*group)
+      self.last_id = last_id
+      # rows committed since the scan; later commits wait on the lock and skip what this already folded
+      self._fold(self.journal.rows(after_id=last_id))
+      self.built = True
+
+  def report(self, by=None) -> dict:
+    # totals, or {key: totals} for one of DIMENSIONS
+    if not self.built:
+      self.rebuild()
+    with self.lock:
+      if by is None:
+        return self.total.summary()
+      return {key: group.summary() for key, group in sorted(self.groups[by].items(), key=lambda item: str(item[0]))}
+
+  def stats(self) -> dict:
+    return {'built': self.built, 'last_id': self.last_id, **{dimension: len(self.groups[dimension]) for dimension in DIMENSIONS}}
+
+def format_report(report, by=None) -> str:
+  columns = ('trades', 'success_rate', 'sol_spent', 'sol_received', 'fees_sol', 'pnl_sol')
+  rows = [('total', report)] if by is None else list(report.items())
+  lines = [f"{by or '':<46}" + ''.join(f'{column:>14}' for column in columns)]
+  for key, summary in rows:
+    if by == 'hour':
+      key = datetime.fromtimestamp(key, timezone.utc).strftime('%Y-%m-%d %H:00Z')
+    lines.append(f"{str(key):<46}" + ''.join(
+      f"{summary[column]:>14.2%}" if column == 'success_rate' else
+      f"{summary[column]:>14}" if column == 'trades' else f"{summary[column]:>14.6f}"
+      for column in columns
+    ))
+  return '\n'.join(lines)
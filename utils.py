@@ -9,14 +9,19 @@ from solana.rpc.types import TxOpts
 from solana.transaction import Transaction
 import solders.system_program as sp
 from solders.keypair import Keypair # type: ignore
-import json, requests
+import os, threading
+from dotenv import load_dotenv
 
 import spl.token.instructions as spl_token
-from spl.token.client import Token
 from spl.token._layouts import ACCOUNT_LAYOUT
 from spl.token.constants import WRAPPED_SOL_MINT
 
 from layouts import SWAP_LAYOUT, LIQ_LAYOUT
+from pool_store import PoolStore, POOL_DB_FILE
+from pool_ingest import ingest_file
+from pool_refresh import PoolRefresher
+from token_cache import TokenMetaCache
+import tracing
 from typing import Tuple
 
 LAMPORTS_PER_SOL = 1000000000
@@ -26,86 +31,85 @@ AMM_POOL_ID = Pubkey.from_string('CDSr3ssLcRB6XYPJwAfFt18MZvEZp4LjHcvzBVZ45duo')
 withdrawQueue = Pubkey.from_string("11111111111111111111111111111111")
 lpVault = Pubkey.from_string("11111111111111111111111111111111")
 
+load_dotenv()
+_pool_store = None
+_pool_refresher = None
+_pool_miss_resolver = None
+_pool_lock = threading.Lock()
+token_cache = TokenMetaCache(ttl=int(os.getenv('TOKEN_CACHE_TTL', 3600)))
+
 def getBalance(solana_client, mint, payer):
+    # reads the wallet's token account for this mint directly instead of scanning all of them
     try:
-      tokenPk = mint
-      amount_in = 0
-      accountProgramId = solana_client.get_account_info_json_parsed(tokenPk)
-      programid_of_token = accountProgramId.value.owner
-
-      accounts = (
-        solana_client.get_token_accounts_by_owner_json_parsed(
-          payer.pubkey(), TokenAccountOpts(program_id=programid_of_token)
-        )
-      ).value
-      
-      for account in accounts:
-        mint_in_acc = account.account.data.parsed["info"]["mint"]
-        if str(mint_in_acc) == str(mint):
-          amount_in = account.account.data.parsed["info"]["tokenAmount"]["uiAmount"]
-          break
-      return amount_in
+      programid_of_token, decimals = token_cache.mint_info(solana_client, mint)
+      ata = token_cache.ata(payer.pubkey(), mint, programid_of_token)
+
+      account = solana_client.get_account_info(ata).value
+      if account is not None:
+        amount = ACCOUNT_LAYOUT.parse(account.data).amount
+      else:
+        # holdings outside the ATA
+        accounts = solana_client.get_token_accounts_by_owner(payer.pubkey(), TokenAccountOpts(mint=mint)).value
+        amount = ACCOUNT_LAYOUT.parse(accounts[0].account.data).amount if accounts else 0
+      return amount / 10 ** decimals
     except Exception as e:
       print('error_occured', e)
       pass
 
-def extract_pool_info(pools_list: list, mint: str) -> dict:
-  for pool in pools_list:
-    if pool['baseMint'] == mint and pool['quoteMint'] == 'So11111111111111111111111111111111111111112':
-      return pool
-    elif pool['quoteMint'] == mint and pool['baseMint'] == 'So11111111111111111111111111111111111111112':
-      return pool
-  raise Exception(f'{mint} pool not found!')
-  
+def get_pool_store() -> PoolStore:
+  # opened on first use, so importing utils leaves the working directory alone
+  global _pool_store
+  if _pool_store is None:
+    with _pool_lock:
+      if _pool_store is None:
+        _pool_store = PoolStore(POOL_DB_FILE)
+  return _pool_store
+
+def get_pool_refresher() -> PoolRefresher:
+  global _pool_refresher
+  if _pool_refresher is None:
+    store = get_pool_store()
+    with _pool_lock:
+      if _pool_refresher is None:
+        _pool_refresher = PoolRefresher(
+          store,
+          interval=int(os.getenv('POOL_REFRESH_INTERVAL', 600)),
+          miss_cooldown=int(os.getenv('POOL_MISS_COOLDOWN', 60)),
+          miss_resolver=_pool_miss_resolver,
+        )
+  return _pool_refresher
+
+def set_pool_miss_resolver(resolver):
+  # single pool lookup for index misses, kept until the refresher is created
+  global _pool_miss_resolver
+  _pool_miss_resolver = resolver
+  if _pool_refresher is not None:
+    _pool_refresher.miss_resolver = resolver
+
 def fetch_pool_keys(mint: str):
-  amm_info = {}
-  all_pools = {}
-  try:
-    # Using this so it will be faster else no option, we go the slower way.
-    with open('all_pools.json', 'r') as file:
-      all_pools = json.load(file)
-    amm_info = extract_pool_info(all_pools, mint)
-  except:
-    print('no local pool keys found, downloading from server, might take some time, please wait ...')
-    resp = requests.get('https://api.raydium.io/v2/sdk/liquidity/mainnet.json', stream=True)
-    pools = resp.json()
-    official = pools['official']
-    unofficial = pools['unOfficial']
-    all_pools = official + unofficial
-
-    # Store all_pools in a JSON file
-    with open('all_pools.json', 'w') as file:
-      json.dump(all_pools, file)
-    try:
-      amm_info = extract_pool_info(all_pools, mint)
-    except:
-      return "failed"
-
-  return {
-    'amm_id': Pubkey.from_string(amm_info['id']),
-    'authority': Pubkey.from_string(amm_info['authority']),
-    'base_mint': Pubkey.from_string(amm_info['baseMint']),
-    'base_decimals': amm_info['baseDecimals'],
-    'quote_mint': Pubkey.from_string(amm_info['quoteMint']),
-    'quote_decimals': amm_info['quoteDecimals'],
-    'lp_mint': Pubkey.from_string(amm_info['lpMint']),
-    'open_orders': Pubkey.from_string(amm_info['openOrders']),
-    'target_orders': Pubkey.from_string(amm_info['targetOrders']),
-    'base_vault': Pubkey.from_string(amm_info['baseVault']),
-    'quote_vault': Pubkey.from_string(amm_info['quoteVault']),
-    'market_id': Pubkey.from_string(amm_info['marketId']),
-    'market_base_vault': Pubkey.from_string(amm_info['marketBaseVault']),
-    'market_quote_vault': Pubkey.from_string(amm_info['marketQuoteVault']),
-    'market_authority': Pubkey.from_string(amm_info['marketAuthority']),
-    'bids': Pubkey.from_string(amm_info['marketBids']),
-    'asks': Pubkey.from_string(amm_info['marketAsks']),
-    'event_queue': Pubkey.from_string(amm_info['marketEventQueue'])
-  }
-
-def make_swap_instruction(amount_in: int, token_account_in: Pubkey.from_string, token_account_out: Pubkey.from_string, accounts: dict, mint, ctx, owner) -> Instruction:
-  tokenPk = mint
-  accountProgramId = ctx.get_account_info_json_parsed(tokenPk)
-  TOKEN_PROGRAM_ID = accountProgramId.value.owner
+  pool_store = get_pool_store()
+  pool_refresher = get_pool_refresher()
+  if pool_store.is_empty():
+    if os.path.isfile('all_pools.json'):
+      # one-off import of the legacy json cache into the pool index
+      ingest_file(pool_store, 'all_pools.json')
+    else:
+      print('no local pool keys found, downloading from server, might take some time, please wait ...')
+      pool_refresher.refresh()
+  pool_refresher.start()
+
+  with tracing.span('pool_index'):
+    pool_keys = pool_refresher.lookup(mint)
+  if pool_keys is None:
+    return "failed"
+  return pool_keys
+
+def make_swap_instruction(amount_in: int, token_account_in: Pubkey.from_string, token_account_out: Pubkey.from_string, accounts: dict, mint, ctx, owner, min_amount_out: int = 0) -> Instruction:
+  with tracing.span('swap_instruction'):
+    return _make_swap_instruction(amount_in, token_account_in, token_account_out, accounts, mint, ctx, owner, min_amount_out)
+
+def _make_swap_instruction(amount_in, token_account_in, token_account_out, accounts, mint, ctx, owner, min_amount_out):
+  TOKEN_PROGRAM_ID = token_cache.token_program(ctx, mint)
 
   keys = [
     AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
@@ -132,20 +136,12 @@ def make_swap_instruction(amount_in: int, token_account_in: Pubkey.from_string,
     dict(
       instruction=9,
       amount_in=int(amount_in),
-      min_amount_out=0
+      min_amount_out=int(min_amount_out)
     )
   )
   
   return Instruction(AMM_PROGRAM_ID, data, keys)
 
-def sell_get_token_account(ctx, owner: Pubkey.from_string, mint: Pubkey.from_string):
-  try:
-    account_data = ctx.get_token_accounts_by_owner(owner, TokenAccountOpts(mint))
-    return account_data.value[0].pubkey
-  except:
-    print("Mint Token Not found")
-    return None
-
 async def make_liquidity_remover_instruction(
   payer_pk, Lp_account, quoteAccount, BaseAccount, accounts, TOKEN_PROGRAM_ID, amount
 ):
@@ -197,24 +193,23 @@ def create_account_with_seed_args(
     amount: int,
     skip_confirmation: bool,
     commitment: Commitment,
+    compute_unit_price: int = 5000000,
+    compute_unit_limit: int = 1400000,
 ) -> Tuple[Pubkey, Transaction, Keypair, Keypair, TxOpts]:
 
-    GAS_PRICE = 5000000
-    GAS_LIMIT = 10000000
-
     new_keypair = Keypair()
     seed_str = str(new_keypair.pubkey())[0:32]
 
     seed_pk = Pubkey.create_with_seed(payer.pubkey(), seed_str, program_id)
-    amount = Token.get_min_balance_rent_for_exempt_for_account(ctx)
+    amount = token_cache.token_account_rent(ctx)
 
     txn = Transaction(fee_payer=payer.pubkey())
 
     """
     Gas and shit
     """
-    txn.add(set_compute_unit_price(GAS_PRICE))
-    txn.add(set_compute_unit_limit(GAS_LIMIT))
+    txn.add(set_compute_unit_price(compute_unit_price))
+    txn.add(set_compute_unit_limit(compute_unit_limit))
 
     txn.add(
       sp.create_account_with_seed(
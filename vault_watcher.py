@@ -0,0 +1,198 @@
+import asyncio, base64, json
+import websockets
+from solders.pubkey import Pubkey # type: ignore
+from account_loader import MAX_ACCOUNTS_PER_CALL
+
+def websocket_url(http_url: str) -> str:
+  if http_url.startswith('https://'):
+    return 'wss://' + http_url[len('https://'):]
+  if http_url.startswith('http://'):
+    return 'ws://' + http_url[len('http://'):]
+  return http_url
+
+class VaultWatcher:
+  """
+  Pushes lamport changes of watched accounts to callbacks; the latest raw
+  data of each account is kept in `data` for callers that decode it.
+  All accounts share one accountSubscribe websocket. While it is down the
+  watcher polls them with getMultipleAccounts every `poll_interval` seconds
+  and reconnects with exponential backoff.
+  """
+
+  def __init__(self, ws_url, client, commitment='confirmed', poll_interval=1.0, reconnect_delay=1.0, max_reconnect_delay=30.0):
+    self.ws_url = ws_url
+    self.client = client
+    self.commitment = commitment
+    self.poll_interval = poll_interval
+    self.reconnect_delay = reconnect_delay
+    self.max_reconnect_delay = max_reconnect_delay
+
+    self.callbacks = {}
+    self.lamports = {}
+    self.data = {}
+    self.ws = None
+    self.request_id = 0
+    self.requests = {}
+    # subscription id -> key and back; `pending` holds keys whose accountSubscribe is unanswered
+    self.subscriptions = {}
+    self.subscription_ids = {}
+    self.pending = {}
+    self.task = None
+
+    self.notifications = 0
+    self.polls = 0
+    self.reconnects = 0
+
+  def watch(self, pubkey, callback):
+    key = str(pubkey)
+    if key not in self.callbacks:
+      self.callbacks[key] = []
+      if self.ws is not None:
+        asyncio.get_running_loop().create_task(self._subscribe(key))
+    self.callbacks[key].append(callback)
+    if self.task is None or self.task.done():
+      self.task = asyncio.get_running_loop().create_task(self._run())
+
+  def unwatch(self, pubkey, callback):
+    key = str(pubkey)
+    callbacks = self.callbacks.get(key, [])
+    if callback in callbacks:
+      callbacks.remove(callback)
+    if callbacks or key not in self.callbacks:
+      return
+    del self.callbacks[key]
+    self.lamports.pop(key, None)
+    self.data.pop(key, None)
+    if self.ws is None:
+      return
+    if not self.callbacks:
+      asyncio.get_running_loop().create_task(self.ws.close())
+      return
+    # a subscribe still in flight is undone when its id arrives
+    subscription = self.subscription_ids.pop(key, None)
+    if subscription is not None:
+      del self.subscriptions[subscription]
+      asyncio.get_running_loop().create_task(self._send('accountUnsubscribe', [subscription]))
+
+  async def wait_until(self, pubkey, predicate) -> int:
+    # lamports of the first update for which predicate(lamports) is true
+    future = asyncio.get_running_loop().create_future()
+
+    def on_update(lamports):
+      if not future.done() and predicate(lamports):
+        future.set_result(lamports)
+
+    self.watch(pubkey, on_update)
+    try:
+      try:
+        await self._poll_once([str(pubkey)])
+      except Exception as e:
+        print('vault poll failed: ', e)
+      return await future
+    finally:
+      self.unwatch(pubkey, on_update)
+
+  def _dispatch(self, key, lamports, data=None):
+    # a notification or poll still in flight for an unwatched account would bring its entries back
+    if key not in self.callbacks:
+      return
+    self.lamports[key] = lamports
+    self.data[key] = data
+    for callback in list(self.callbacks.get(key, [])):
+      callback(lamports)
+
+  async def _send(self, method, params):
+    self.request_id += 1
+    await self.ws.send(json.dumps({'jsonrpc': '2.0', 'id': self.request_id, 'method': method, 'params': params}))
+    return self.request_id
+
+  async def _subscribe(self, key):
+    # watch() and a reconnect pass can race on a key; only one subscribe goes out
+    if key in self.pending or key in self.subscription_ids:
+      return
+    self.request_id += 1
+    self.pending[key] = self.request_id
+    self.requests[self.request_id] = key
+    await self.ws.send(json.dumps({
+      'jsonrpc': '2.0', 'id': self.request_id, 'method': 'accountSubscribe',
+      'params': [key, {'encoding': 'base64', 'commitment': self.commitment}],
+    }))
+
+  def _on_message(self, message):
+    if 'id' in message:
+      key = self.requests.pop(message['id'], None)
+      if key is None:
+        return
+      if self.pending.get(key) == message['id']:
+        del self.pending[key]
+      if 'result' not in message:
+        return
+      if key not in self.callbacks:
+        # unwatched while the subscribe was in flight
+        asyncio.get_running_loop().create_task(self._send('accountUnsubscribe', [message['result']]))
+        return
+      self.subscriptions[message['result']] = key
+      self.subscription_ids[key] = message['result']
+      return
+    if message.get('method') == 'accountNotification':
+      key = self.subscriptions.get(message['params']['subscription'])
+      if key is not None:
+        self.notifications += 1
+        value = message['params']['result']['value']
+        self._dispatch(key, value['lamports'], base64.b64decode(value['data'][0]))
+
+  async def _run(self):
+    delay = self.reconnect_delay
+    while self.callbacks:
+      try:
+        async with websockets.connect(self.ws_url) as ws:
+          self.ws = ws
+          delay = self.reconnect_delay
+          for key in list(self.callbacks):
+            await self._subscribe(key)
+          # catch up on anything that changed while we were disconnected
+          await self._poll_once(list(self.callbacks))
+          async for message in ws:
+            self._on_message(json.loads(message))
+      except Exception as e:
+        print('vault websocket dropped, polling until reconnect: ', e)
+      finally:
+        # subscriptions die with the socket, the next connection starts from a clean slate
+        self.ws = None
+        self.requests.clear()
+        self.subscriptions.clear()
+        self.subscription_ids.clear()
+        self.pending.clear()
+      if not self.callbacks:
+        break
+      self.reconnects += 1
+      await self._poll_for(delay)
+      delay = min(delay * 2, self.max_reconnect_delay)
+
+  async def _poll_once(self, keys):
+    for index in range(0, len(keys), MAX_ACCOUNTS_PER_CALL):
+      chunk = keys[index:index + MAX_ACCOUNTS_PER_CALL]
+      resp = await self.client.get_multiple_accounts([Pubkey.from_string(key) for key in chunk])
+      self.polls += 1
+      for key, account in zip(chunk, resp.value):
+        if account is not None:
+          self._dispatch(key, account.lamports, account.data)
+
+  async def _poll_for(self, duration):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    while self.callbacks and loop.time() < deadline:
+      try:
+        await self._poll_once(list(self.callbacks))
+      except Exception as e:
+        print('vault poll failed: ', e)
+      await asyncio.sleep(min(self.poll_interval, max(deadline - loop.time(), 0)))
+
+  def stats(self) -> dict:
+    return {
+      'watched': len(self.callbacks),
+      'connected': self.ws is not None,
+      'notifications': self.notifications,
+      'polls': self.polls,
+      'reconnects': self.reconnects,
+    }
@@ -0,0 +1,85 @@
+from solana.rpc.types import TokenAccountOpts
+from solders.pubkey import Pubkey # type: ignore
+from spl.token._layouts import ACCOUNT_LAYOUT
+from spl.token.constants import TOKEN_PROGRAM_ID
+
+class WalletBalances:
+  """
+  Token balances of one wallet, keyed by mint. The first lookup of a mint
+  reads its associated token account directly through the account loader,
+  falling back to a mint-filtered getTokenAccountsByOwner for non-ATA
+  holdings. The account is then watched, so later checks are a dict hit
+  kept current by accountSubscribe notifications.
+  """
+
+  def __init__(self, client, loader, owner, token_cache, watcher=None):
+    self.client = client
+    self.loader = loader
+    self.owner = owner
+    self.token_cache = token_cache
+    self.watcher = watcher
+    self.balances = {}
+    self.callbacks = {}
+
+    self.hits = 0
+    self.misses = 0
+    self.updates = 0
+
+  async def balance(self, mint):
+    # (token account, raw amount); the account is the ATA to create when the wallet holds none
+    key = str(mint)
+    entry = self.balances.get(key)
+    if entry is not None:
+      self.hits += 1
+      return entry
+    self.misses += 1
+
+    program = await self.token_cache.token_program_async(self.loader, mint)
+    ata = self.token_cache.ata(self.owner, mint, program)
+    account = await self.loader.load(ata)
+    if account is not None:
+      self._track(key, ata, ACCOUNT_LAYOUT.parse(account.data).amount)
+    else:
+      accounts = (await self.client.get_token_accounts_by_owner(self.owner, TokenAccountOpts(mint=mint))).value
+      if accounts:
+        self._track(key, accounts[0].pubkey, ACCOUNT_LAYOUT.parse(accounts[0].account.data).amount)
+      else:
+        # watching the ATA picks it up as soon as a buy creates it
+        self._track(key, ata, 0)
+    return self.balances[key]
+
+  def get(self, mint):
+    # raw amount if the mint is tracked, None otherwise
+    entry = self.balances.get(str(mint))
+    return None if entry is None else entry[1]
+
+  async def load_all(self, programs=(TOKEN_PROGRAM_ID,)):
+    # one raw scan per token program to seed the map with every holding; pass token-2022 too if the wallet uses it
+    for program in programs:
+      resp = await self.client.get_token_accounts_by_owner(self.owner, TokenAccountOpts(program_id=program))
+      for account in resp.value:
+        parsed = ACCOUNT_LAYOUT.parse(account.account.data)
+        mint = str(Pubkey(parsed.mint))
+        if mint not in self.balances or parsed.amount > self.balances[mint][1]:
+          self._track(mint, account.pubkey, parsed.amount)
+    return len(self.balances)
+
+  def _track(self, mint, account, amount):
+    previous = self.balances.get(mint)
+    self.balances[mint] = (account, amount)
+    if self.watcher is None or (previous is not None and previous[0] == account):
+      return
+    if previous is not None:
+      self.watcher.unwatch(previous[0], self.callbacks.pop(mint))
+
+    def on_update(lamports):
+      data = self.watcher.data.get(str(account))
+      amount = ACCOUNT_LAYOUT.parse(data).amount if data and len(data) >= ACCOUNT_LAYOUT.sizeof() else 0
+      self.balances[mint] = (account, amount)
+      self.updates += 1
+
+    self.callbacks[mint] = on_update
+    self.watcher.watch(account, on_update)
+
+  def stats(self) -> dict:
+    return {'mints': len(self.balances), 'hits': self.hits, 'misses': self.misses, 'updates': self.updates}